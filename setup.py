@@ -4,14 +4,19 @@ setup(
     name="zutui",
     version="1.0.0",
     packages=find_packages(),
+    package_data={"zut_app.fixtures": ["*.html", "*.json"]},
     install_requires=[
-        "requests",
+        "httpx",
         "beautifulsoup4",
         "textual",
+        'tomli; python_version < "3.11"',
     ],
+    extras_require={
+        "fast": ["lxml", "brotli"],
+    },
     entry_points={
         'console_scripts': [
-            'zutui=zut_app.zutui:main',
+            'zutui=zut_app.cli:main',
         ],
     },
 )
\ No newline at end of file
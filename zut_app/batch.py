@@ -0,0 +1,117 @@
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+from .model import dump_data
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE_LIMIT = 2.0
+DEFAULT_PARSE_WORKERS = 2
+
+class HostRateLimiter:
+    # httpx request hook spacing requests to the same host at least
+    # 1/rate seconds apart, shared by every account's client.
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = {}
+        self.lock = asyncio.Lock()
+
+    async def __call__(self, request):
+        if not self.interval: return
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            now = loop.time()
+            slot = max(now, self.next_slot.get(request.url.host, now))
+            self.next_slot[request.url.host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def load_accounts(path):
+    with open(path, 'rb') as f:
+        config = tomllib.load(f)
+    accounts = [a for a in config.get("accounts", []) if a.get("username") and a.get("password")]
+    return accounts, config.get("batch", {})
+
+def emit(record):
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+async def refresh_account(account, semaphore, rate_limiter, parse_executor, base_url=None):
+    from .zut_client import AsyncZUT
+
+    async with semaphore:
+        client = AsyncZUT(account["username"], account["password"], persist=False, rate_limiter=rate_limiter,
+                          base_url=account.get("base_url") or base_url)
+        client.parse_executor = parse_executor
+        start = time.perf_counter()
+        record = {"type": "account", "username": account["username"], "ok": False}
+        try:
+            data = await client.refresh_data()
+            if data:
+                record.update(ok=True, subjects=len(data), data=dump_data(data))
+            else:
+                record["error"] = client.last_error or "no grades returned"
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            await client.close()
+        record["latency"] = round(time.perf_counter() - start, 3)
+        record["timings"] = {k: round(v, 3) for k, v in client.timings.items()}
+        emit(record)
+        return record
+
+def summarize(records, wall):
+    latencies = [r["latency"] for r in records]
+    failed = [r for r in records if not r["ok"]]
+    summary = {
+        "type": "summary",
+        "accounts": len(records),
+        "ok": len(records) - len(failed),
+        "failed": len(failed),
+        "wall": round(wall, 3),
+        "errors": {r["username"]: r.get("error") for r in failed},
+    }
+    if latencies:
+        summary["latency"] = {
+            "min": min(latencies),
+            "p50": round(statistics.median(latencies), 3),
+            "mean": round(statistics.fmean(latencies), 3),
+            "max": max(latencies),
+        }
+    return summary
+
+async def run_batch_async(accounts, concurrency, rate_limit, parse_workers, base_url=None):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    rate_limiter = HostRateLimiter(rate_limit)
+    start = time.perf_counter()
+    # Grade pages are parsed in worker processes so parsing many accounts is
+    # not serialized on the GIL.
+    with ProcessPoolExecutor(max_workers=max(1, parse_workers)) as parse_executor:
+        records = await asyncio.gather(*(
+            refresh_account(account, semaphore, rate_limiter, parse_executor, base_url) for account in accounts))
+    summary = summarize(records, time.perf_counter() - start)
+    emit(summary)
+    return summary
+
+def run_batch(path, concurrency=None, rate_limit=None, parse_workers=None):
+    accounts, options = load_accounts(path)
+    if not accounts:
+        print(f"No accounts found in {path}", file=sys.stderr)
+        return 1
+    summary = asyncio.run(run_batch_async(
+        accounts,
+        concurrency or options.get("concurrency", DEFAULT_CONCURRENCY),
+        rate_limit if rate_limit is not None else options.get("rate_limit", DEFAULT_RATE_LIMIT),
+        parse_workers or options.get("parse_workers", DEFAULT_PARSE_WORKERS),
+        options.get("base_url"),
+    ))
+    return 0 if not summary["failed"] else 2
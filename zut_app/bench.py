@@ -0,0 +1,277 @@
+
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from . import fixtures, parsers
+from .config import APP_DIR
+from .model import FinalGrade
+
+BASELINE_FILE = os.path.join(APP_DIR, "bench_baseline.json")
+DEFAULT_SUBJECTS = 300
+DEFAULT_PARTIALS = 10
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_CONCURRENCY = 4
+CHUNK_SIZE = 16384
+# Anything faster is mostly timer noise; never flagged as a regression.
+MIN_SECONDS = 0.002
+COMPARED = ("seconds", "peak_kb")
+# A baseline only applies to the same workload.
+WORKLOAD = ("subjects", "partials", "seed", "concurrency")
+
+def _finals(data):
+    return {key: item.replace(partial_grades=()) for key, item in data.items()}
+
+def _partials(data):
+    return {key: item.partial_grades for key, item in data.items()}
+
+def _streamed(stream_cls):
+    # The page fed in network-sized chunks, as _stream_grid does.
+    def parse(html, backend=None):
+        raw = html.encode("utf-8")
+        grid = stream_cls("utf-8")
+        for i in range(0, len(raw), CHUNK_SIZE):
+            grid.feed(raw[i:i + CHUNK_SIZE])
+            if grid.done:
+                break
+        return grid.result
+    return parse
+
+def parse_cases(data):
+    # (name, page, parse function, backend, correctness check)
+    finals, partials = _finals(data), _partials(data)
+    backends = ("lxml", "strainer", "soup") if parsers.HAS_LXML else ("strainer", "soup")
+    cases = []
+    for backend in backends:
+        cases += [
+            (f"login_form/{backend}", "login", parsers.parse_hidden_inputs, backend,
+             lambda r: "__VIEWSTATE" in r),
+            (f"final/{backend}", "final", parsers.parse_final_grades, backend, finals.__eq__),
+            (f"partial/{backend}", "partial", parsers.parse_partial_grades, backend, partials.__eq__),
+        ]
+    if parsers.HAS_LXML:
+        cases += [
+            ("final/stream", "final", _streamed(parsers.FinalGridStream), None, finals.__eq__),
+            ("partial/stream", "partial", _streamed(parsers.PartialGridStream), None, partials.__eq__),
+        ]
+    return cases
+
+def _timed(func, args, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+def _peak_kb(func, args):
+    # Python allocations only; libxml2's own buffers are not traced.
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def bench_parsers(corpus, pages, data, repeat):
+    results = {}
+    for name, page, func, backend, check in parse_cases(data):
+        html = pages[page]
+        result, seconds = _timed(func, (html, backend), repeat)
+        size = len(html.encode("utf-8"))
+        results[f"{corpus}:{name}"] = {
+            "seconds": seconds,
+            "mb_s": size / seconds / 1e6 if seconds else None,
+            "peak_kb": _peak_kb(func, (html, backend)),
+            "ok": bool(check(result)),
+        }
+    return results
+
+def _modified(data, step=10):
+    # Every `step`-th subject gets a new first-term grade.
+    keys = list(data)[::step]
+    changed = dict(data)
+    for key in keys:
+        finals = data[key].finals
+        grade = "5,0" if finals[0] is None or finals[0].grade != "5,0" else "4,0"
+        changed[key] = data[key].replace(finals=(FinalGrade(grade, "2025-03-01"),) + finals[1:])
+    return changed, {"added": [], "removed": [], "modified": keys}
+
+async def bench_table(data, repeat):
+    from textual.app import App
+    from .render import RenderModel
+    from .zutui import DashboardScreen, GradesTable, ZutApp
+
+    class BenchApp(App):
+        CSS = ZutApp.CSS
+
+        def on_mount(self):
+            self.push_screen(DashboardScreen(offline=True))
+
+    changed, changes = _modified(data)
+    builds, fills, renders, patches = [], [], [], []
+    app = BenchApp()
+    async with app.run_test(size=(160, 50)) as pilot:
+        await pilot.pause()
+        screen = app.screen
+        table = screen.query_one(GradesTable)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rendered = RenderModel().build(data)
+            builds.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            screen.update_table(data, rendered=rendered)
+            fills.append(time.perf_counter() - start)
+            await pilot.pause()
+
+            # As after a refresh: only the changed subjects miss the memo.
+            screen.render_model.build(data)
+            start = time.perf_counter()
+            patched = screen.render_model.build(changed)
+            renders.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            screen.update_table(changed, changes, patched)
+            patches.append(time.perf_counter() - start)
+            await pilot.pause()
+        ok = table.row_count == len(changed)
+        peak = _peak_kb(screen.update_table, (data, None, RenderModel().build(data)))
+    return {
+        "table:render_rows": {"seconds": statistics.median(builds), "ok": ok},
+        "table:fill": {"seconds": statistics.median(fills), "peak_kb": peak, "ok": ok},
+        "table:render_changed": {"seconds": statistics.median(renders), "ok": ok},
+        "table:patch": {"seconds": statistics.median(patches), "ok": ok},
+    }
+
+async def bench_refresh(data, repeat, concurrency):
+    # Full refresh_data() against a local stand-in server: cold (login and
+    # both pages), warm (logged in, form state cached) and `concurrency`
+    # accounts at once.
+    from .metrics import Metrics
+    from .standin import StandIn
+    from .zut_client import AsyncZUT
+
+    server = StandIn(data=data)
+    base_url = server.start()
+
+    def client():
+        # Private metrics: benchmark refreshes stay out of the configured sinks.
+        return AsyncZUT("bench", "bench", persist=False, base_url=base_url, metrics=Metrics())
+
+    async def refresh(c):
+        start = time.perf_counter()
+        result = await c.refresh_data()
+        return result == data, time.perf_counter() - start
+
+    cold, warm, ok = [], [], True
+    try:
+        for _ in range(repeat):
+            c = client()
+            try:
+                for times in (cold, warm):
+                    good, seconds = await refresh(c)
+                    times.append(seconds)
+                    ok = ok and good
+            finally:
+                await c.close()
+        clients = [client() for _ in range(concurrency)]
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(refresh(c) for c in clients))
+            wall = time.perf_counter() - start
+        finally:
+            for c in clients:
+                await c.close()
+    finally:
+        server.stop()
+    return {
+        "refresh:cold": {"seconds": statistics.median(cold), "ok": ok},
+        "refresh:warm": {"seconds": statistics.median(warm), "ok": ok},
+        "refresh:concurrent": {"seconds": wall, "ok": all(good for good, _ in results)},
+    }
+
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_baseline(path, params, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "python": platform.python_version(), "results": results}, f, indent=2)
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, entry in results.items():
+        base = baseline.get(name, {})
+        for metric in COMPARED:
+            old, new = base.get(metric), entry.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == "seconds" and new < MIN_SECONDS:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+def format_report(params, results, regressions):
+    flagged = {name for name, *_ in regressions}
+    lines = [f"zutui benchmark ({params['subjects']} subjects, ~{params['partials']} partials each, "
+             f"seed {params['seed']}, median of {params['repeat']})",
+             f"  {'case':<34}{'ms':>10}{'MB/s':>10}{'peak KiB':>12}"]
+    for name, entry in results.items():
+        mb_s = f"{entry['mb_s']:.1f}" if entry.get("mb_s") else "-"
+        peak = f"{entry['peak_kb']:.0f}" if entry.get("peak_kb") is not None else "-"
+        marks = ("" if entry["ok"] else "  WRONG RESULT") + ("  REGRESSION" if name in flagged else "")
+        lines.append(f"  {name:<34}{entry['seconds'] * 1000:10.2f}{mb_s:>10}{peak:>12}{marks}")
+    for name, metric, old, new in regressions:
+        lines.append(f"regression: {name} {metric} {old:.4g} -> {new:.4g} ({(new / old - 1) * 100:+.0f}%)")
+    return "\n".join(lines)
+
+def run_bench(subjects=None, partials=None, seed=0, repeat=None, baseline=None, save=False,
+              tolerance=None, as_json=False, table=True, refresh=False, concurrency=None):
+    params = {
+        "subjects": subjects or DEFAULT_SUBJECTS,
+        "partials": partials if partials is not None else DEFAULT_PARTIALS,
+        "seed": seed,
+        "repeat": max(1, repeat or DEFAULT_REPEAT),
+        "concurrency": max(1, concurrency or DEFAULT_CONCURRENCY),
+    }
+    baseline_path = baseline or BASELINE_FILE
+    tolerance = DEFAULT_TOLERANCE if tolerance is None else tolerance
+
+    pages, data = fixtures.recorded()
+    results = bench_parsers("recorded", pages, data, params["repeat"])
+    pages, data = fixtures.synthesize(params["subjects"], params["partials"], seed)
+    results.update(bench_parsers("synthetic", pages, data, params["repeat"]))
+    if table:
+        results.update(asyncio.run(bench_table(data, params["repeat"])))
+    if refresh:
+        results.update(asyncio.run(bench_refresh(data, params["repeat"], params["concurrency"])))
+
+    regressions = []
+    stored = None if save else load_baseline(baseline_path)
+    workload = {k: params[k] for k in WORKLOAD}
+    if stored and {k: stored.get("params", {}).get(k) for k in WORKLOAD} != workload:
+        print(f"Baseline {baseline_path} was recorded for another workload, not comparing.", file=sys.stderr)
+    elif stored:
+        regressions = compare(results, stored.get("results", {}), tolerance)
+    if save:
+        save_baseline(baseline_path, params, results)
+        print(f"Baseline saved to {baseline_path}", file=sys.stderr)
+
+    if as_json:
+        sys.stdout.write(json.dumps({"params": params, "results": results,
+                                     "regressions": [dict(zip(("case", "metric", "baseline", "value"), r))
+                                                     for r in regressions]}) + "\n")
+    else:
+        print(format_report(params, results, regressions))
+    if not all(entry["ok"] for entry in results.values()):
+        return 1
+    return 2 if regressions else 0
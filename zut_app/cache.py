@@ -0,0 +1,139 @@
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+from .config import APP_DIR
+from .store import GradeStore
+
+# Legacy JSON cache, imported into the SQLite store on first run.
+CACHE_FILE = os.path.join(APP_DIR, "grades_cache.json")
+
+_store = None
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = GradeStore()
+        _store.import_json(CACHE_FILE)
+    return _store
+
+def load_cache():
+    try:
+        return get_store().load()
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to load cache: {e}", file=sys.stderr)
+        return {}
+
+def save_cache(data, changes=None):
+    try:
+        return get_store().save(data, changes)
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to save cache: {e}", file=sys.stderr)
+        return None
+
+def fetch_info():
+    # When and by whom the cached grades were last fetched.
+    try:
+        return get_store().fetched()
+    except (sqlite3.DatabaseError, ValueError) as e:
+        print(f"Failed to load cache: {e}", file=sys.stderr)
+        return None
+
+def mark_fetched(source, base_url=None):
+    try:
+        get_store().mark_fetched(source, base_url)
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to save cache: {e}", file=sys.stderr)
+
+def load_partials():
+    # key -> (partial grades, fetched_at) for the lazy partial-grade mode;
+    # grades saved by a full refresh count as stale (fetched_at 0).
+    try:
+        store = get_store()
+        fetched = store.partials_fetched()
+        return {key: (item.partial_grades, fetched.get(key, 0))
+                for key, item in store.load().items() if key in fetched or item.partial_grades}
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to load cache: {e}", file=sys.stderr)
+        return {}
+
+def save_partials(key, partials, fetched_at=None):
+    try:
+        return get_store().save_subject_partials(key, partials, fetched_at)
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to save cache: {e}", file=sys.stderr)
+        return None
+
+def load_news(limit=100):
+    try:
+        return get_store().news(limit)
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to load news: {e}", file=sys.stderr)
+        return []
+
+def known_news():
+    try:
+        return get_store().known_news()
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to load news: {e}", file=sys.stderr)
+        return set()
+
+def save_news(items):
+    try:
+        return get_store().save_news(items)
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to save news: {e}", file=sys.stderr)
+        return 0
+
+def load_semesters():
+    # [(id, label, data)] of the closed semesters, in page order.
+    try:
+        return get_store().semesters()
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to load semesters: {e}", file=sys.stderr)
+        return []
+
+def closed_semesters():
+    try:
+        return get_store().closed_semesters()
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to load semesters: {e}", file=sys.stderr)
+        return set()
+
+def save_semester(semester_id, label, position, data):
+    try:
+        get_store().save_semester(semester_id, label, position, data)
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to save semester: {e}", file=sys.stderr)
+
+def current_semester():
+    # (id, label) of the semester the grades tables hold, if known.
+    try:
+        value = get_store().get_meta("current_semester")
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to load semesters: {e}", file=sys.stderr)
+        return None
+    return tuple(json.loads(value)) if value else None
+
+def set_current_semester(semester_id, label):
+    try:
+        get_store().set_meta("current_semester", json.dumps([semester_id, label], ensure_ascii=False))
+    except sqlite3.DatabaseError as e:
+        print(f"Failed to save semester: {e}", file=sys.stderr)
+
+def fingerprint(record):
+    # Only compared within one process, so repr of the plain tuple is enough.
+    return hashlib.sha1(repr(record.astuple()).encode('utf-8')).hexdigest()
+
+def compute_changeset(old_prints, new_prints):
+    return {
+        "added": [k for k in new_prints if k not in old_prints],
+        "removed": [k for k in old_prints if k not in new_prints],
+        "modified": [k for k in new_prints if k in old_prints and old_prints[k] != new_prints[k]],
+    }
+
+def is_empty_changeset(changes):
+    return not (changes["added"] or changes["removed"] or changes["modified"])
@@ -0,0 +1,96 @@
+
+import argparse
+import sys
+
+from .config import load_config, read_config
+from .metrics import METRICS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="zutui")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="render the first frame without touching the network, then report startup timings")
+    commands = parser.add_subparsers(dest="command")
+
+    daemon = commands.add_parser("daemon", help="poll e-Dziekanat once and share the results over a UNIX socket")
+    daemon.add_argument("--socket", help="socket path (default: ~/zutui/daemon.sock)")
+
+    batch = commands.add_parser("batch", help="refresh many accounts concurrently and stream NDJSON results")
+    batch.add_argument("accounts", help="TOML file with [[accounts]] entries and an optional [batch] table")
+    batch.add_argument("--concurrency", type=int, help="accounts refreshed at once")
+    batch.add_argument("--rate-limit", type=float, help="requests per second per host (0 = unlimited)")
+    batch.add_argument("--parse-workers", type=int, help="processes used for HTML parsing")
+
+    export = commands.add_parser("export", help="print grades for scripts (never loads the TUI)")
+    export.add_argument("--format", choices=("json", "ndjson", "csv"), default="json")
+    source = export.add_mutually_exclusive_group()
+    source.add_argument("--from-cache", dest="refresh", action="store_false", help="use the local cache (default)")
+    source.add_argument("--refresh", dest="refresh", action="store_true", help="fetch fresh grades first")
+    export.set_defaults(refresh=False)
+
+    bench = commands.add_parser("bench", help="benchmark parsing and table population offline, on recorded and synthetic pages")
+    bench.add_argument("--subjects", type=int, help="subjects in the synthetic transcript")
+    bench.add_argument("--partials", type=int, help="mean partial grades per subject")
+    bench.add_argument("--seed", type=int, default=0, help="seed of the synthetic transcript")
+    bench.add_argument("--repeat", type=int, help="runs per case (the median is reported)")
+    bench.add_argument("--baseline", help="baseline file (default: ~/zutui/bench_baseline.json)")
+    bench.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    bench.add_argument("--tolerance", type=float, help="allowed slowdown before flagging a regression (0.25 = 25%%)")
+    bench.add_argument("--json", action="store_true", help="print the results as JSON")
+    bench.add_argument("--no-table", dest="table", action="store_false", help="skip the table population benchmark")
+    bench.add_argument("--refresh", action="store_true", help="also time full refreshes against a local stand-in server")
+    bench.add_argument("--concurrency", type=int, help="accounts refreshed at once in the --refresh benchmark")
+
+    standin = commands.add_parser("standin", help="serve a local stand-in e-Dziekanat for end-to-end and load tests")
+    standin.add_argument("--host", default="127.0.0.1")
+    standin.add_argument("--port", type=int, default=8080)
+    standin.add_argument("--subjects", type=int, help="serve a synthetic transcript of this size (default: the recorded one)")
+    standin.add_argument("--partials", type=int, default=10, help="mean partial grades per synthetic subject")
+    standin.add_argument("--seed", type=int, default=0)
+    standin.add_argument("--semesters", type=int, default=1, help="semesters in the transcript (older ones are synthetic)")
+    standin.add_argument("--password", help="accept only this password (default: any)")
+    standin.add_argument("--latency", type=float, default=0.0, help="seconds added before every response")
+    standin.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    standin.add_argument("--body-rate", type=int, default=0, help="send bodies at this many bytes per second")
+    standin.add_argument("--session-ttl", type=float, default=0.0, help="expire sessions this many seconds after login")
+    standin.add_argument("--error-rate", type=float, default=0.0, help="chance that a request starts a burst of 503s")
+    standin.add_argument("--error-burst", type=int, default=1, help="consecutive 503s per burst")
+    standin.add_argument("--verbose", action="store_true", help="log every request")
+
+    args = parser.parse_args(argv)
+    METRICS.configure(read_config())
+
+    if args.command == "export":
+        from .export import run_export
+        return run_export(args.format, args.refresh, load_config() if args.refresh else None)
+
+    if args.command == "bench":
+        from .bench import run_bench
+        return run_bench(args.subjects, args.partials, args.seed, args.repeat, args.baseline,
+                         args.save_baseline, args.tolerance, args.json, args.table, args.refresh, args.concurrency)
+
+    if args.command == "standin":
+        from .standin import Faults, run_standin
+        faults = Faults(args.latency, args.jitter, args.body_rate, args.session_ttl, args.error_rate,
+                        args.error_burst, args.seed)
+        return run_standin(args.host, args.port, args.subjects, args.partials, args.seed, args.password,
+                           faults, args.verbose, max(1, args.semesters))
+
+    if args.command == "batch":
+        from .batch import run_batch
+        return run_batch(args.accounts, args.concurrency, args.rate_limit, args.parse_workers)
+
+    if args.command == "daemon":
+        from .daemon import SOCKET_FILE, run_daemon
+        creds = load_config()
+        if not creds:
+            print("No saved credentials, log in with `zutui` first.", file=sys.stderr)
+            return 1
+        return run_daemon(creds["username"], creds["password"], args.socket or SOCKET_FILE, creds.get("base_url"),
+                          bool(creds.get("all_semesters")))
+
+    from .zutui import main as run_tui
+    run_tui(startup_profile=args.startup_profile)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+
+import json
+import os
+
+USER_HOME = os.path.expanduser("~")
+APP_DIR = os.path.join(USER_HOME, "zutui")
+if not os.path.exists(APP_DIR):
+    os.makedirs(APP_DIR)
+
+CONFIG_FILE = os.path.join(APP_DIR, "config.json")
+BASE_URL = "https://edziekanat.zut.edu.pl/WU/"
+
+def resolve_base_url(base_url=None):
+    # Another e-Dziekanat (e.g. `zutui standin`) instead of the production host.
+    return base_url or os.environ.get("ZUTUI_BASE_URL") or BASE_URL
+
+def read_config():
+    if not os.path.exists(CONFIG_FILE):
+        return {}
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            settings = json.load(f)
+        return settings if isinstance(settings, dict) else {}
+    except:
+        return {}
+
+def load_config():
+    creds = read_config()
+    if creds.get("username") and creds.get("password"):
+        return creds
+    return None
+
+def save_config(username, password):
+    # Keep any other settings (metrics sinks, ...) already in the file.
+    settings = read_config()
+    settings.update({"username": username, "password": password})
+    try:
+        with open(CONFIG_FILE, "w") as f:
+            json.dump(settings, f)
+    except: pass
@@ -0,0 +1,226 @@
+
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import time
+from datetime import datetime
+
+from .cache import is_empty_changeset, load_cache
+from .config import APP_DIR
+from .model import dump_data
+
+SOCKET_FILE = os.path.join(APP_DIR, "daemon.sock")
+
+BASE_INTERVAL = 1800
+EXAM_INTERVAL = 600
+MIN_INTERVAL = 60
+MAX_BACKOFF = 4
+BACKOFF = 1.5
+JITTER = 0.1
+# Winter session, summer session and the September retakes.
+EXAM_MONTHS = (1, 2, 6, 7, 9)
+
+class DaemonRunning(Exception):
+    pass
+
+def is_exam_session(now=None):
+    return (now or datetime.now()).month in EXAM_MONTHS
+
+class AdaptivePoller:
+    def __init__(self, base=BASE_INTERVAL, exam=EXAM_INTERVAL, minimum=MIN_INTERVAL):
+        self.base = base
+        self.exam = exam
+        self.minimum = minimum
+        self.interval = None
+
+    def next_interval(self, changed, now=None):
+        base = self.exam if is_exam_session(now) else self.base
+        if changed or self.interval is None:
+            self.interval = base
+        else:
+            self.interval = min(self.interval * BACKOFF, base * MAX_BACKOFF)
+        jittered = self.interval * random.uniform(1 - JITTER, 1 + JITTER)
+        return max(self.minimum, jittered)
+
+class WatchDaemon:
+    def __init__(self, client, socket_path=SOCKET_FILE, poller=None):
+        self.client = client
+        self.socket_path = socket_path
+        self.poller = poller or AdaptivePoller()
+        self.subscribers = set()
+        self.data = load_cache()
+        self.updated_at = None
+        self.last_poll = 0
+        self.next_poll = None
+        self.wake = None
+        self.news_task = None
+
+    def log(self, msg):
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", file=sys.stderr, flush=True)
+
+    async def run(self):
+        self.wake = asyncio.Event()
+        # Only a stale socket may be replaced, never one a live daemon listens on.
+        running = connect(self.socket_path)
+        if running:
+            running.close()
+            raise DaemonRunning(self.socket_path)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_subscriber, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.log(f"listening on {self.socket_path}")
+        try:
+            await self.poll_loop()
+        finally:
+            server.close()
+            await self.client.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def poll_loop(self):
+        self.client.track(self.data)
+        while True:
+            changed = await self.refresh()
+            delay = self.poller.next_interval(changed)
+            self.next_poll = time.time() + delay
+            self.log(f"next poll in {delay:.0f}s")
+            try:
+                await asyncio.wait_for(self.wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            # Forced refreshes from subscribers still honour the minimum interval.
+            wait = self.last_poll + self.poller.minimum - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def refresh(self):
+        self.last_poll = time.time()
+        try:
+            data = await self.client.refresh_data()
+        except Exception as e:
+            self.log(f"refresh error: {e}")
+            data = None
+
+        if not data:
+            await self.broadcast({"type": "status", "ok": False, "updated_at": self.updated_at})
+            return False
+
+        news = self.client.news_task
+        if news and news is not self.news_task:
+            self.news_task = news
+            asyncio.ensure_future(self.announce_news(news))
+
+        changes = self.client.last_changes
+        self.data = data
+        self.updated_at = time.time()
+        if is_empty_changeset(changes):
+            await self.broadcast({"type": "status", "ok": True, "updated_at": self.updated_at})
+            return False
+
+        self.log(f"changes: {len(changes['added'])} added, {len(changes['removed'])} removed, "
+                 f"{len(changes['modified'])} modified")
+        await self.broadcast({"type": "changes", "changes": changes, "data": dump_data(data),
+                              "updated_at": self.updated_at})
+        return True
+
+    async def announce_news(self, task):
+        items = await task
+        if items:
+            self.log(f"news: {len(items)} new")
+            await self.broadcast({"type": "news", "items": items})
+
+    async def send(self, writer, message):
+        writer.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b"\n")
+        await writer.drain()
+
+    async def broadcast(self, message):
+        message["next_poll"] = self.next_poll
+        for writer in list(self.subscribers):
+            try:
+                await self.send(writer, message)
+            except (ConnectionError, OSError):
+                self.subscribers.discard(writer)
+
+    async def handle_subscriber(self, reader, writer):
+        self.subscribers.add(writer)
+        try:
+            await self.send(writer, {"type": "snapshot", "data": dump_data(self.data),
+                                     "updated_at": self.updated_at, "next_poll": self.next_poll})
+            while line := await reader.readline():
+                try:
+                    command = json.loads(line)
+                except ValueError:
+                    continue
+                if command.get("cmd") == "refresh":
+                    self.wake.set()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+class DaemonConnection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile('r', encoding='utf-8')
+
+    def events(self):
+        try:
+            for line in self.reader:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except (ValueError, OSError):
+            # Closed under us by close().
+            return
+
+    def request_refresh(self):
+        try:
+            self.sock.sendall(b'{"cmd": "refresh"}\n')
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        # Wake a thread blocked reading first, the reader's lock is held until it returns.
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+def connect(socket_path=SOCKET_FILE):
+    if not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return DaemonConnection(sock)
+
+def run_daemon(username, password, socket_path=SOCKET_FILE, base_url=None, all_semesters=False):
+    from .zut_client import AsyncZUT
+    client = AsyncZUT(username, password, fetch_news=True, base_url=base_url, all_semesters=all_semesters,
+                      source="daemon")
+    daemon = WatchDaemon(client, socket_path)
+    try:
+        asyncio.run(daemon.run())
+    except DaemonRunning:
+        print(f"A daemon is already running on {socket_path}.", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,72 @@
+
+import csv
+import json
+import os
+import sys
+
+from .cache import load_cache
+from .model import SLOTS
+
+FORMATS = ("json", "ndjson", "csv")
+
+def iter_records(data):
+    for key, item in data.items():
+        yield key, item
+
+def write_json(records, out):
+    # Written incrementally so big transcripts never sit in memory twice.
+    out.write("{")
+    for i, (key, item) in enumerate(records):
+        out.write(",\n" if i else "\n")
+        out.write(f"    {json.dumps(key, ensure_ascii=False)}: {json.dumps(item.to_dict(), ensure_ascii=False)}")
+    out.write("\n}\n")
+
+def write_ndjson(records, out):
+    for key, item in records:
+        out.write(json.dumps({"key": key, **item.to_dict()}, ensure_ascii=False) + "\n")
+
+def write_csv(records, out):
+    writer = csv.writer(out)
+    header = ["key", "subject", "type"]
+    for slot in SLOTS:
+        header += [slot, f"{slot}_date"]
+    writer.writerow(header + ["partial_count", "partial_grades"])
+    for key, item in records:
+        row = [key, item.subject, item.type]
+        for grade in item.finals:
+            row += [grade.grade, grade.date] if grade else ["", ""]
+        partials = item.partial_grades or ()
+        writer.writerow(row + [len(partials), ";".join(p.grade for p in partials)])
+
+WRITERS = {"json": write_json, "ndjson": write_ndjson, "csv": write_csv}
+
+def fetch(creds):
+    from .zut_client import ZUT
+    client = ZUT(creds["username"], creds["password"], base_url=creds.get("base_url"))
+    try:
+        client.load_cache()
+        return client.refresh_data()
+    finally:
+        client.close()
+
+def run_export(fmt="json", refresh=False, creds=None, out=None):
+    out = out or sys.stdout
+    if refresh:
+        if not creds:
+            print("No saved credentials, log in with `zutui` first.", file=sys.stderr)
+            return 1
+        data = fetch(creds)
+        if not data:
+            print("Refresh failed.", file=sys.stderr)
+            return 2
+    else:
+        data = load_cache()
+    try:
+        WRITERS[fmt](iter_records(data), out)
+        out.flush()
+    except BrokenPipeError:
+        # The reader (`head`, ...) is gone. Point stdout at devnull so the
+        # flush at interpreter exit does not raise again.
+        if out is sys.stdout:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
@@ -0,0 +1,229 @@
+
+import base64
+import html
+import json
+import os
+import random
+import re
+from datetime import date, timedelta
+
+from ..model import SLOTS, FinalGrade, PartialGrade, Subject, load_data
+from ..parsers import FINAL_GRID_ID, PARTIAL_GRID_ID, SEMESTER_FIELD
+
+# Recorded e-Dziekanat responses with the student, teachers and form state
+# replaced by made-up values. expected.json holds what the parsers must
+# return for them.
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES = {
+    "login": "Logowanie2.html",
+    "final": "OcenyP.html",
+    "partial": "OcenyCzast.html",
+    "news": "News.html",
+}
+
+SUBJECTS = [
+    "Analiza matematyczna", "Algebra liniowa", "Bazy danych", "Fizyka techniczna",
+    "Języki i paradygmaty programowania", "Sieci komputerowe", "Systemy operacyjne",
+    "Grafika komputerowa", "Inżynieria oprogramowania", "Metody numeryczne",
+    "Teoria współbieżności", "Elektrotechnika", "Ochrona własności intelektualnej",
+    "Sztuczna inteligencja", "Podstawy zarządzania", "Wychowanie fizyczne", "Język angielski",
+    "Statystyka", "Technika cyfrowa", "Kompilatory",
+]
+TYPES = ("W", "Ć", "L", "P", "S")
+TITLES = ("dr", "dr inż.", "mgr", "mgr inż.", "prof. dr hab.")
+FIRST_NAMES = ("Jan", "Anna", "Piotr", "Ewa", "Łukasz", "Małgorzata", "Tomasz", "Zofia")
+LAST_NAMES = ("Kowalski", "Nowak", "Wiśniewski", "Ślęzak", "Wójcik", "Kamińska", "Żak", "Lewandowski")
+DESCS = ("Kolokwium", "Sprawdzian", "Projekt", "Sprawozdanie", "Kartkówka", "Aktywność", "Laboratorium")
+GRADES = ("2,0", "3,0", "3,5", "4,0", "4,5", "5,0")
+GRADE_WEIGHTS = (2, 3, 3, 4, 3, 3)
+# ASP.NET view state grows with the grid; bytes per row, roughly as recorded.
+VIEWSTATE_PER_ROW = 96
+SEMESTER_START = date(2024, 10, 1)
+FIRST_YEAR = 2023
+SELECTED = ' selected="selected"'
+SEMESTER_OPTIONS = re.compile(r'(<select name="' + re.escape(SEMESTER_FIELD) + r'"[^>]*>)(.*?)(</select>)', re.S)
+EXPAND_BUTTON = "ctl00$ctl00$ContentPlaceHolder$RightContentPlaceHolder$rg_Przedmioty$ctl00$ctl{:02d}$GECBtnExpandColumn"
+
+def page(name):
+    with open(os.path.join(FIXTURE_DIR, PAGES[name]), encoding="utf-8") as f:
+        return f.read()
+
+def expected():
+    with open(os.path.join(FIXTURE_DIR, "expected.json"), encoding="utf-8") as f:
+        return load_data(json.load(f))
+
+def recorded():
+    return {name: page(name) for name in PAGES}, expected()
+
+# --- rendering ---
+
+def _escape(text):
+    return html.escape(text, quote=False)
+
+def _table_span(doc, grid_id):
+    # Start and end offsets of the grid table, nested tables included.
+    start = doc.rindex("<table", 0, doc.index(f'id="{grid_id}"'))
+    depth, pos = 0, start
+    while True:
+        opening = doc.find("<table", pos)
+        closing = doc.find("</table>", pos)
+        if opening != -1 and opening < closing:
+            depth += 1
+            pos = opening + 6
+        else:
+            depth -= 1
+            pos = closing + 8
+            if not depth:
+                return start, pos
+
+def _splice(doc, grid_id, table, viewstate):
+    start, end = _table_span(doc, grid_id)
+    doc = doc[:start] + table + doc[end:]
+    marker = 'name="__VIEWSTATE" id="__VIEWSTATE" value="'
+    vs_start = doc.index(marker) + len(marker)
+    vs_end = doc.index('"', vs_start)
+    return doc[:vs_start] + viewstate + doc[vs_end:]
+
+def _final_cell(grade):
+    if not grade:
+        return "<td>&nbsp;</td>"
+    if not grade.date:
+        return f"<td>{_escape(grade.grade)}</td>"
+    return f"<td>{_escape(grade.grade)}<br />{grade.date}</td>"
+
+def final_table(data):
+    rows = ['<table class="gridDane" cellspacing="0" cellpadding="3" rules="all" border="1" '
+            f'id="{FINAL_GRID_ID}" style="border-collapse:collapse;">',
+            '\t<tr class="gridNaglowek">\n\t\t<td>Przedmiot</td><td>Forma zajęć</td><td>Godziny</td>'
+            '<td>Punkty ECTS</td><td>Forma zaliczenia</td><td>Termin 1</td><td>Termin 2</td>'
+            '<td>Termin 3</td><td>Komisja</td>\n\t</tr>']
+    for item in data.values():
+        form = "Egzamin" if item.type == "W" else "Zaliczenie"
+        rows.append(f'<tr class="gridDane">\n\t\t<td>{_escape(item.subject)}</td><td>{_escape(item.type)}</td>'
+                    f'<td>30</td><td>2</td><td>{form}</td>{"".join(map(_final_cell, item.finals))}\n\t</tr>')
+    rows.append("</table>")
+    return "".join(rows)
+
+def _partial_detail(grid_id, n, partials):
+    head = ('<thead><tr><th scope="col" class="rgHeader">Lp.</th><th scope="col" class="rgHeader">Opis</th>'
+            '<th scope="col" class="rgHeader">Ocena</th><th scope="col" class="rgHeader">Data</th>'
+            '<th scope="col" class="rgHeader">Wystawił</th></tr></thead>')
+    if partials:
+        body = "".join(
+            f'<tr class="{"rgAltRow" if i % 2 else "rgRow"}"><td>{i + 1}</td><td>{_escape(p.desc)}</td>'
+            f'<td>{_escape(p.grade)}</td><td>{p.date}</td><td>{_escape(p.teacher)}</td></tr>'
+            for i, p in enumerate(partials))
+    else:
+        body = '<tr class="rgNoRecords"><td colspan="5"><div>Brak ocen cząstkowych</div></td></tr>'
+    return (f'<tr class="rgDetailRow">\n\t\t<td colspan="3"><table cellspacing="0" class="rgDetailTable" '
+            f'border="0" id="{grid_id}_ctl{n + 2:02d}_Detail10" style="width:100%;">\n\t\t\t{head}\n'
+            f'\t\t\t<tbody>{body}</tbody>\n\t\t</table></td>\n\t</tr>')
+
+def _is_open(expanded, key):
+    return expanded is True or (expanded is not False and key in expanded)
+
+def partial_table(data, expanded=True):
+    # RadGrid with one expand/collapse button per subject; collapsed rows
+    # (all of them in the lazy mode's index) have no detail row. `expanded`
+    # is True, False or the keys of the open subjects.
+    rows = [f'<table cellspacing="0" class="rgMasterTable" border="0" id="{PARTIAL_GRID_ID}" '
+            'style="width:100%;table-layout:auto;empty-cells:show;">',
+            '<thead>\n\t<tr>\n\t\t<th scope="col" class="rgHeader rgExpandCol">&nbsp;</th>'
+            '<th scope="col" class="rgHeader">Przedmiot</th><th scope="col" class="rgHeader">Forma zajęć</th>'
+            '\n\t</tr>\n</thead><tbody>']
+    for i, item in enumerate(data.values()):
+        n = 4 + 3 * i
+        is_open = _is_open(expanded, item.key)
+        button, title = ("rgCollapse", "Zwiń") if is_open else ("rgExpand", "Rozwiń")
+        rows.append(f'\n\t<tr class="{"rgAltRow" if i % 2 else "rgRow"}" id="{PARTIAL_GRID_ID}__{i}">\n'
+                    f'\t\t<td class="rgExpandCol"><input type="submit" name="{EXPAND_BUTTON.format(n)}" '
+                    f'value=" " title="{title}" class="{button}" /></td><td>{_escape(item.subject)}</td>'
+                    f'<td>{_escape(item.type)}</td>\n\t</tr>')
+        if is_open:
+            rows.append(_partial_detail(PARTIAL_GRID_ID, n, item.partial_grades or ()))
+    rows.append("\n\t</tbody>\n</table>")
+    return "".join(rows)
+
+def expand_buttons(data):
+    # Expand button name -> subject key, as laid out by partial_table().
+    return {EXPAND_BUTTON.format(4 + 3 * i): key for i, key in enumerate(data)}
+
+def _viewstate(rng, rows):
+    return base64.b64encode(rng.randbytes(VIEWSTATE_PER_ROW * rows)).decode("ascii")
+
+def _semester_options(doc, semesters):
+    options = "".join(
+        f'\n\t<option{SELECTED if selected else ""} value="{value}">{_escape(label)}</option>'
+        for value, label, selected in semesters)
+    return SEMESTER_OPTIONS.sub(lambda m: m.group(1) + options + "\n" + m.group(3), doc, count=1)
+
+def final_page(data, rng=None, semesters=None):
+    # `semesters`: [(value, label, selected)] for the drop-down; the recorded
+    # one is kept when not given.
+    rng = rng or random.Random(0)
+    doc = _splice(page("final"), FINAL_GRID_ID, final_table(data), _viewstate(rng, len(data)))
+    return _semester_options(doc, semesters) if semesters is not None else doc
+
+def partial_page(data, expanded=True, rng=None):
+    rng = rng or random.Random(0)
+    rows = len(data) + sum(len(item.partial_grades or ()) for item in data.values() if _is_open(expanded, item.key))
+    return _splice(page("partial"), PARTIAL_GRID_ID, partial_table(data, expanded), _viewstate(rng, rows))
+
+# --- synthetic transcripts ---
+
+def _date(rng):
+    return (SEMESTER_START + timedelta(days=rng.randrange(140))).isoformat()
+
+def _finals(rng):
+    # Failed attempts are followed by a retake, up to the commission.
+    if rng.random() < 0.1:
+        return (None,) * len(SLOTS)
+    finals = []
+    for _ in SLOTS:
+        grade = rng.choices(GRADES, GRADE_WEIGHTS)[0]
+        finals.append(FinalGrade(grade, _date(rng)))
+        if grade != "2,0":
+            break
+    return tuple(finals) + (None,) * (len(SLOTS) - len(finals))
+
+def _partials(rng, count, teacher):
+    partials = []
+    for i in range(count):
+        grade = rng.choices(GRADES + ("nb", "+"), GRADE_WEIGHTS + (1, 1))[0]
+        partials.append(PartialGrade(grade, f"{rng.choice(DESCS)} {i + 1}", _date(rng), teacher))
+    return tuple(partials)
+
+def transcript(subjects, partials, seed=0):
+    # `partials` is the mean per subject; counts vary from 0 to twice that.
+    rng = random.Random(seed)
+    data = {}
+    for i in range(subjects):
+        name = SUBJECTS[i % len(SUBJECTS)]
+        if i >= len(SUBJECTS):
+            name = f"{name} {i // len(SUBJECTS) + 1}"
+        teacher = f"{rng.choice(TITLES)} {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        item = Subject(name, rng.choice(TYPES), _finals(rng), _partials(rng, rng.randint(0, 2 * partials), teacher))
+        data[item.key] = item
+    return data
+
+def semester_label(number):
+    year = FIRST_YEAR + (number - 1) // 2
+    return f"{number} ({'zimowy' if number % 2 else 'letni'} {year}/{year + 1})"
+
+def semesters(count, subjects, partials, seed=0):
+    # [(value, label, data)] oldest first; the last one is the current semester.
+    return [(str(n), semester_label(n), transcript(subjects, partials, seed + n)) for n in range(1, count + 1)]
+
+def synthesize(subjects, partials, seed=0):
+    # Pages for a transcript of the given size plus the data the parsers
+    # must recover from them.
+    data = transcript(subjects, partials, seed)
+    rng = random.Random(seed)
+    pages = {
+        "login": page("login"),
+        "final": final_page(data, rng),
+        "partial": partial_page(data, True, rng),
+        "partial_index": partial_page(data, False, rng),
+        "news": page("news"),
+    }
+    return pages, data
@@ -0,0 +1,105 @@
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+HISTORY_SIZE = 50
+
+class Metrics:
+    # Rolling history of per-phase timings and response sizes. Each refresh
+    # (or UI action) becomes one record; sinks get every finished record.
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.history = deque(maxlen=history_size)
+        self.counters = {"ok": 0, "error": 0}
+        self.jsonl_path = None
+        self.prometheus_path = None
+        self.lock = threading.Lock()
+
+    def configure(self, settings):
+        self.jsonl_path = settings.get("metrics_jsonl")
+        self.prometheus_path = settings.get("metrics_prometheus")
+
+    @contextmanager
+    def span(self, name, kind="ui"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, {name: time.perf_counter() - start})
+
+    def record(self, kind, spans, sizes=None, counters=None, ok=True, error=None):
+        entry = {
+            "ts": time.time(),
+            "kind": kind,
+            "ok": ok,
+            "spans": {k: round(v, 6) for k, v in spans.items()},
+            "bytes": dict(sizes or {}),
+        }
+        if counters:
+            entry["counters"] = dict(counters)
+        if error:
+            entry["error"] = error
+        with self.lock:
+            self.history.append(entry)
+            if kind == "refresh":
+                self.counters["ok" if ok else "error"] += 1
+        self.write(entry)
+        return entry
+
+    def last(self, kind):
+        with self.lock:
+            for entry in reversed(self.history):
+                if entry["kind"] == kind:
+                    return entry
+        return None
+
+    def recent(self, kind, limit=20):
+        with self.lock:
+            return [e for e in self.history if e["kind"] == kind][-limit:]
+
+    def write(self, entry):
+        try:
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if self.prometheus_path and entry["kind"] == "refresh":
+                self.write_prometheus(entry)
+        except OSError as e:
+            print(f"Failed to write metrics: {e}", file=sys.stderr)
+
+    def write_prometheus(self, entry):
+        lines = [
+            "# HELP zutui_phase_seconds Duration of each phase of the last refresh.",
+            "# TYPE zutui_phase_seconds gauge",
+        ]
+        lines += [f'zutui_phase_seconds{{phase="{k}"}} {v}' for k, v in entry["spans"].items()]
+        lines += [
+            "# HELP zutui_response_bytes Response body size per request of the last refresh.",
+            "# TYPE zutui_response_bytes gauge",
+        ]
+        lines += [f'zutui_response_bytes{{phase="{k}"}} {v}' for k, v in entry["bytes"].items()]
+        lines += [
+            "# HELP zutui_form_state Form-state cache lookups during the last refresh.",
+            "# TYPE zutui_form_state gauge",
+        ]
+        lines += [f'zutui_form_state{{result="{k}"}} {v}' for k, v in entry.get("counters", {}).items()]
+        lines += [
+            "# HELP zutui_refresh_total Refreshes by result since start.",
+            "# TYPE zutui_refresh_total counter",
+            f'zutui_refresh_total{{result="ok"}} {self.counters["ok"]}',
+            f'zutui_refresh_total{{result="error"}} {self.counters["error"]}',
+            "# HELP zutui_last_refresh_timestamp_seconds Unix time of the last refresh.",
+            "# TYPE zutui_last_refresh_timestamp_seconds gauge",
+            f"zutui_last_refresh_timestamp_seconds {entry['ts']}",
+        ]
+        # The textfile collector may read at any time; replace atomically.
+        tmp = self.prometheus_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.prometheus_path)
+
+METRICS = Metrics()
@@ -0,0 +1,130 @@
+
+import sys
+
+SLOTS = ("term_1", "retake_1", "retake_2", "commission")
+FAILING = ("nzal", "ndst")
+
+# Course types, dates, teachers and grade strings repeat across hundreds of
+# rows; interning keeps one copy of each.
+_intern = sys.intern
+
+def parse_grade(grade):
+    try:
+        return float(grade.replace(",", "."))
+    except (AttributeError, ValueError):
+        return None
+
+class FinalGrade:
+    __slots__ = ("grade", "value", "date")
+
+    def __init__(self, grade, date=""):
+        self.grade = _intern(grade)
+        self.value = parse_grade(grade)
+        self.date = _intern(date or "")
+
+    @property
+    def failing(self):
+        return self.value == 2.0 or self.grade.lower() in FAILING
+
+    @property
+    def label(self):
+        return self.grade.replace(",", ".")
+
+    def astuple(self):
+        return (self.grade, self.date)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.astuple() == self.astuple()
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self.astuple()!r}"
+
+    def to_dict(self):
+        return {"grade": self.grade, "date": self.date}
+
+class PartialGrade:
+    __slots__ = ("grade", "value", "desc", "date", "teacher")
+
+    def __init__(self, grade, desc="", date="", teacher=""):
+        self.grade = _intern(grade)
+        self.value = parse_grade(grade)
+        self.desc = _intern(desc or "")
+        self.date = _intern(date or "")
+        self.teacher = _intern(teacher or "")
+
+    failing = FinalGrade.failing
+    __eq__ = FinalGrade.__eq__
+    __repr__ = FinalGrade.__repr__
+
+    @property
+    def label(self):
+        return self.grade.strip().replace(",", ".")
+
+    def astuple(self):
+        return (self.grade, self.desc, self.date, self.teacher)
+
+    def to_dict(self):
+        return {"grade": self.grade, "desc": self.desc, "date": self.date, "teacher": self.teacher}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["grade"], d.get("desc", ""), d.get("date", ""), d.get("teacher", ""))
+
+class Subject:
+    # `finals` is aligned with SLOTS; `partial_grades` is None while the lazy
+    # mode has not loaded the subject.
+    __slots__ = ("key", "subject", "type", "finals", "partial_grades")
+
+    def __init__(self, subject, type, finals=(None,) * len(SLOTS), partial_grades=(), key=None):
+        self.subject = _intern(subject)
+        self.type = _intern(type)
+        self.key = _intern(key or f"{subject}_{type}")
+        self.finals = tuple(finals)
+        self.partial_grades = None if partial_grades is None else tuple(partial_grades)
+
+    @property
+    def final_grades(self):
+        return dict(zip(SLOTS, self.finals))
+
+    @property
+    def latest(self):
+        # The last attempt that has a grade.
+        return next((g for g in reversed(self.finals) if g), None)
+
+    def replace(self, **changes):
+        fields = {"subject": self.subject, "type": self.type, "finals": self.finals,
+                  "partial_grades": self.partial_grades, "key": self.key}
+        fields.update(changes)
+        return Subject(**fields)
+
+    def astuple(self):
+        partials = None if self.partial_grades is None else tuple(p.astuple() for p in self.partial_grades)
+        return (self.subject, self.type, tuple(g and g.astuple() for g in self.finals), partials)
+
+    __eq__ = FinalGrade.__eq__
+    __repr__ = FinalGrade.__repr__
+
+    def to_dict(self):
+        return {
+            "subject": self.subject,
+            "type": self.type,
+            "final_grades": {slot: g and g.to_dict() for slot, g in zip(SLOTS, self.finals)},
+            "partial_grades": None if self.partial_grades is None else [p.to_dict() for p in self.partial_grades],
+        }
+
+    @classmethod
+    def from_dict(cls, d, key=None):
+        finals = d.get("final_grades") or {}
+        partials = d.get("partial_grades", [])
+        return cls(
+            d["subject"], d["type"],
+            tuple(FinalGrade(g["grade"], g.get("date", "")) if g else None for g in map(finals.get, SLOTS)),
+            None if partials is None else [PartialGrade.from_dict(p) for p in partials],
+            key,
+        )
+
+def dump_data(data):
+    return {key: item.to_dict() for key, item in data.items()}
+
+def load_data(raw):
+    return {key: Subject.from_dict(item, key) for key, item in (raw or {}).items()}
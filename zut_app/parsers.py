@@ -0,0 +1,429 @@
+
+import hashlib
+import os
+import re
+import threading
+import time
+import tracemalloc
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .model import FinalGrade, PartialGrade, Subject
+
+try:
+    import lxml.etree
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+FINAL_GRID_ID = 'ctl00_ctl00_ContentPlaceHolder_RightContentPlaceHolder_dgDane'
+PARTIAL_GRID_ID = 'ctl00_ctl00_ContentPlaceHolder_RightContentPlaceHolder_rg_Przedmioty_ctl00'
+NEWS_GRID_ID = 'ctl00_ctl00_ContentPlaceHolder_RightContentPlaceHolder_dlNews'
+SEMESTER_FIELD = 'ctl00$ctl00$ContentPlaceHolder$RightContentPlaceHolder$ddlSemestr'
+DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}|\d{2}\.\d{2}\.\d{4}')
+
+# "auto" picks lxml when it is installed and the SoupStrainer parse otherwise;
+# "soup" is the original full html.parser tree and the fallback for the others.
+BACKENDS = ("auto", "lxml", "strainer", "soup")
+BACKEND = os.environ.get("ZUTUI_PARSER", "auto")
+PROFILE_MEMORY = os.environ.get("ZUTUI_PARSE_PROFILE") == "1"
+# Grade pages are parsed while they download when lxml is available.
+STREAMING = os.environ.get("ZUTUI_STREAM", "1") != "0"
+
+_profile_lock = threading.Lock()
+
+def resolve_backend(backend=None):
+    backend = backend or BACKEND
+    if backend not in BACKENDS:
+        backend = "auto"
+    if backend == "auto":
+        return "lxml" if HAS_LXML else "strainer"
+    if backend == "lxml" and not HAS_LXML:
+        return "strainer"
+    return backend
+
+# --- BeautifulSoup ---
+
+def _soup(html, only=None):
+    return BeautifulSoup(html, 'html.parser', parse_only=only)
+
+def _final_from_soup(table):
+    data = {}
+    for row in table.find_all('tr', class_='gridDane'):
+        cells = row.find_all('td')
+        if not cells: continue
+
+        def parse_cell(c):
+            txt = [t.strip() for t in c.stripped_strings]
+            if not txt: return None
+            return FinalGrade(txt[0], txt[1] if len(txt)>1 else "")
+
+        item = Subject(cells[0].get_text(strip=True), cells[1].get_text(strip=True),
+                       [parse_cell(cells[i]) for i in range(5, 9)])
+        data[item.key] = item
+    return data
+
+def _partial_from_soup(main_grid):
+    partials_map = {}
+    current_key = None
+
+    for row in main_grid.find_all('tr'):
+        classes = row.get('class', [])
+        if ('rgRow' in classes or 'rgAltRow' in classes) and not row.find('table'):
+            cells = row.find_all('td')
+            if len(cells) > 2:
+                subj = cells[1].get_text(strip=True)
+                ctype = cells[2].get_text(strip=True)
+                current_key = f"{subj}_{ctype}"
+
+        nested_table = row.find('table')
+        if nested_table and current_key:
+            grades_list = []
+            for inner_row in nested_table.find_all('tr'):
+                icells = inner_row.find_all('td')
+                if len(icells) >= 4:
+                    g_val = icells[2].get_text(strip=True)
+                    if g_val:
+                        grades_list.append(PartialGrade(
+                            g_val,
+                            icells[1].get_text(strip=True) if len(icells) > 1 else "",
+                            icells[3].get_text(strip=True) if len(icells) > 3 else "",
+                            icells[4].get_text(strip=True) if len(icells) > 4 else ""
+                        ))
+            partials_map[current_key] = tuple(grades_list)
+    return partials_map
+
+def _index_from_soup(main_grid):
+    # Collapsed grid: one row per subject with the submit button that expands it.
+    index = {}
+    for row in main_grid.find_all('tr'):
+        classes = row.get('class', [])
+        if 'rgRow' not in classes and 'rgAltRow' not in classes: continue
+        cells = row.find_all('td')
+        button = row.find('input', type='submit')
+        if len(cells) > 2 and button and button.get('name'):
+            key = f"{cells[1].get_text(strip=True)}_{cells[2].get_text(strip=True)}"
+            index[key] = (button['name'], button.get('value', ''))
+    return index
+
+def _news_item(strings):
+    # One announcement row: the first line is the title, the first date-like
+    # line the date, everything else the body.
+    date = next((t for t in strings if DATE_RE.search(t)), "")
+    rest = [t for t in strings if t is not date]
+    if not rest: return None
+    item_id = hashlib.sha1(f"{date}|{rest[0]}".encode('utf-8')).hexdigest()[:16]
+    return {"id": item_id, "title": rest[0], "date": date, "body": "\n".join(rest[1:])}
+
+def _news_rows(rows, known):
+    # Newest first: stop at the first announcement already seen.
+    items = []
+    for strings in rows:
+        item = _news_item(strings)
+        if item is None: continue
+        if item["id"] in known: break
+        items.append(item)
+    return items
+
+def _news_from_soup(grid, known=()):
+    rows = (list(row.stripped_strings) for row in grid.find_all('tr') if row.find_parent('table') is grid)
+    return _news_rows(rows, known)
+
+def _soup_grid(html, grid_id, restrict):
+    soup = _soup(html, SoupStrainer(id=grid_id) if restrict else None)
+    return soup.find('table', id=grid_id)
+
+# --- lxml ---
+
+def _text(el):
+    return "".join(t.strip() for t in el.xpath('.//text()'))
+
+def _strings(el):
+    return [s for s in (t.strip() for t in el.xpath('.//text()')) if s]
+
+def _classes(el):
+    return (el.get('class') or '').split()
+
+def _lxml_grid(html, grid_id):
+    found = lxml.html.fromstring(html).xpath('//table[@id=$id]', id=grid_id)
+    return found[0] if found else None
+
+def _final_row_lxml(row):
+    cells = row.xpath('.//td')
+    if not cells: return None
+
+    def parse_cell(c):
+        txt = _strings(c)
+        if not txt: return None
+        return FinalGrade(txt[0], txt[1] if len(txt)>1 else "")
+
+    return Subject(_text(cells[0]), _text(cells[1]), [parse_cell(cells[i]) for i in range(5, 9)])
+
+def _final_from_lxml(table):
+    data = {}
+    for row in table.iter('tr'):
+        if 'gridDane' not in _classes(row): continue
+        item = _final_row_lxml(row)
+        if item:
+            data[item.key] = item
+    return data
+
+def _partial_row_lxml(row, current_key):
+    # Returns the subject key in effect after this row and the row's nested
+    # grades (None when the row has no nested table).
+    classes = _classes(row)
+    nested_table = row.find('.//table')
+    if ('rgRow' in classes or 'rgAltRow' in classes) and nested_table is None:
+        cells = row.xpath('.//td')
+        if len(cells) > 2:
+            current_key = f"{_text(cells[1])}_{_text(cells[2])}"
+
+    if nested_table is None or not current_key:
+        return current_key, None
+    grades_list = []
+    for inner_row in nested_table.xpath('.//tr'):
+        icells = inner_row.xpath('.//td')
+        if len(icells) >= 4:
+            g_val = _text(icells[2])
+            if g_val:
+                grades_list.append(PartialGrade(
+                    g_val,
+                    _text(icells[1]),
+                    _text(icells[3]),
+                    _text(icells[4]) if len(icells) > 4 else ""
+                ))
+    return current_key, tuple(grades_list)
+
+def _partial_from_lxml(main_grid):
+    partials_map = {}
+    current_key = None
+
+    for row in main_grid.xpath('.//tr'):
+        current_key, grades = _partial_row_lxml(row, current_key)
+        if grades is not None:
+            partials_map[current_key] = grades
+    return partials_map
+
+def _row_table(row):
+    parent = row.getparent()
+    if parent is not None and parent.tag in ("tbody", "thead", "tfoot"):
+        parent = parent.getparent()
+    return parent
+
+def _news_from_lxml(grid, known=()):
+    rows = (_strings(row) for row in grid.iter('tr') if _row_table(row) is grid)
+    return _news_rows(rows, known)
+
+# --- streaming (lxml) ---
+
+def can_stream(backend=None):
+    return STREAMING and resolve_backend(backend) == "lxml"
+
+class GridStream:
+    # Incremental parse of one grid fed with response chunks as they arrive.
+    # Rows are handled as soon as their </tr> is parsed and dropped from the
+    # tree; `done` is set when the grid table closes so the caller can stop
+    # reading the body.
+    grid_id = None
+
+    def __init__(self, encoding=None):
+        self.parser = lxml.etree.HTMLPullParser(events=("start", "end"), encoding=encoding)
+        self.grid = None
+        self.done = False
+        self.bytes = 0
+        self.seconds = 0.0
+        self.result = {}
+        # Hidden inputs seen so far; ASP.NET 4.5 renders them at the top of
+        # the form, so they are in before the grid ends.
+        self.form = {}
+
+    def feed(self, chunk):
+        start = time.perf_counter()
+        self.bytes += len(chunk)
+        self.parser.feed(chunk)
+        emitted = []
+        for event, el in self.parser.read_events():
+            if event == "start" and el.tag == "input" and el.get("type") == "hidden" and el.get("name"):
+                self.form[el.get("name")] = el.get("value")
+            elif self.grid is None and event == "end" and el.tag == "option":
+                self.option(el)
+            elif self.grid is None:
+                if event == "start" and el.tag == "table" and el.get("id") == self.grid_id:
+                    self.grid = el
+            elif el is self.grid:
+                self.done = True
+                break
+            elif event == "end" and el.tag == "tr" and _row_table(el) is self.grid:
+                key = self.row(el)
+                if key:
+                    emitted.append(key)
+                el.clear()
+                if self.done:
+                    break
+        self.seconds += time.perf_counter() - start
+        return emitted
+
+    def row(self, el):
+        # One row of the grid; returns the key of what it added, if anything.
+        return None
+
+    def option(self, el):
+        pass
+
+    def stats(self):
+        return {"backend": "stream", "bytes": self.bytes, "seconds": self.seconds}
+
+class FinalGridStream(GridStream):
+    grid_id = FINAL_GRID_ID
+
+    def __init__(self, encoding=None):
+        super().__init__(encoding)
+        # The semester drop-down is rendered above the grid.
+        self.semesters = []
+
+    def option(self, el):
+        parent = el.getparent()
+        if parent is not None and parent.get("name") == SEMESTER_FIELD:
+            self.semesters.append((el.get("value"), _text(el), el.get("selected") is not None))
+
+    def row(self, el):
+        if 'gridDane' not in _classes(el): return None
+        item = _final_row_lxml(el)
+        if item:
+            self.result[item.key] = item
+            return item.key
+
+class PartialGridStream(GridStream):
+    grid_id = PARTIAL_GRID_ID
+
+    def __init__(self, encoding=None):
+        super().__init__(encoding)
+        self.current_key = None
+
+    def row(self, el):
+        self.current_key, grades = _partial_row_lxml(el, self.current_key)
+        if grades is not None:
+            self.result[self.current_key] = grades
+            return self.current_key
+
+def _index_from_lxml(main_grid):
+    index = {}
+    for row in main_grid.xpath('.//tr'):
+        classes = _classes(row)
+        if 'rgRow' not in classes and 'rgAltRow' not in classes: continue
+        cells = row.xpath('.//td')
+        buttons = row.xpath('.//input[@type="submit"][@name]')
+        if len(cells) > 2 and buttons:
+            key = f"{_text(cells[1])}_{_text(cells[2])}"
+            index[key] = (buttons[0].get('name'), buttons[0].get('value') or '')
+    return index
+
+class NewsStream(GridStream):
+    # Stops the download at the first announcement in `known`.
+    grid_id = NEWS_GRID_ID
+
+    def __init__(self, encoding=None, known=()):
+        super().__init__(encoding)
+        self.known = set(known)
+        self.result = []
+
+    def row(self, el):
+        item = _news_item(_strings(el))
+        if item is None: return None
+        if item["id"] in self.known:
+            self.done = True
+            return None
+        self.result.append(item)
+        return item["id"]
+
+# --- public ---
+
+def parse_hidden_inputs(html, backend=None):
+    backend = resolve_backend(backend)
+    if backend == "lxml":
+        root = lxml.html.fromstring(html)
+        inputs = root.xpath('//input[@type="hidden"]')
+    else:
+        only = SoupStrainer('input', type='hidden') if backend == "strainer" else None
+        inputs = _soup(html, only).find_all('input', type='hidden')
+    return {inp.get('name'): inp.get('value') for inp in inputs if inp.get('name')}
+
+def parse_semesters(html, backend=None):
+    # [(value, label, selected)] of the semester drop-down, in page order.
+    backend = resolve_backend(backend)
+    if backend == "lxml":
+        options = lxml.html.fromstring(html).xpath('//select[@name=$name]/option', name=SEMESTER_FIELD)
+        return [(o.get('value'), _text(o), o.get('selected') is not None) for o in options]
+    only = SoupStrainer('select', attrs={'name': SEMESTER_FIELD}) if backend == "strainer" else None
+    select = _soup(html, only).find('select', attrs={'name': SEMESTER_FIELD})
+    if not select:
+        return []
+    return [(o.get('value'), o.get_text(strip=True), o.has_attr('selected')) for o in select.find_all('option')]
+
+def _parse_grid(html, grid_id, from_soup, from_lxml, backend):
+    backend = resolve_backend(backend)
+    try:
+        if backend == "lxml":
+            grid = _lxml_grid(html, grid_id)
+            if grid is not None:
+                return from_lxml(grid)
+        elif backend == "strainer":
+            grid = _soup_grid(html, grid_id, restrict=True)
+            if grid:
+                return from_soup(grid)
+    except Exception:
+        pass
+
+    grid = _soup_grid(html, grid_id, restrict=False)
+    return from_soup(grid) if grid else None
+
+def parse_final_grades(html, backend=None):
+    data = _parse_grid(html, FINAL_GRID_ID, _final_from_soup, _final_from_lxml, backend)
+    return data if data is not None else {}
+
+def parse_partial_grades(html, backend=None):
+    # None when the page has no grid at all (an error or maintenance page),
+    # {} for a grid with nothing expanded.
+    return _parse_grid(html, PARTIAL_GRID_ID, _partial_from_soup, _partial_from_lxml, backend)
+
+def parse_news(html, backend=None, known=()):
+    known = set(known)
+    items = _parse_grid(html, NEWS_GRID_ID, lambda grid: _news_from_soup(grid, known),
+                        lambda grid: _news_from_lxml(grid, known), backend)
+    return items if items is not None else []
+
+def parse_partial_page(html, backend=None):
+    # Expanded grid plus the hidden form fields to replay on the next postback.
+    return parse_hidden_inputs(html, backend), parse_partial_grades(html, backend)
+
+def parse_final_page(html, backend=None):
+    # Grades plus what a semester postback needs: hidden fields and the
+    # semester drop-down.
+    return parse_hidden_inputs(html, backend), parse_semesters(html, backend), parse_final_grades(html, backend)
+
+def parse_partial_index(html, backend=None):
+    # Hidden form fields plus {key: (button name, value)} of the collapsed
+    # grid; None without a grid, as in parse_partial_grades.
+    index = _parse_grid(html, PARTIAL_GRID_ID, _index_from_soup, _index_from_lxml, backend)
+    return parse_hidden_inputs(html, backend), index
+
+def profiled(func, html, backend=None):
+    backend = resolve_backend(backend)
+    stats = {"backend": backend, "bytes": len(html)}
+    if not PROFILE_MEMORY:
+        start = time.perf_counter()
+        result = func(html, backend)
+        stats["seconds"] = time.perf_counter() - start
+        return result, stats
+
+    # tracemalloc is process wide, so traced parses must not overlap.
+    with _profile_lock:
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            result = func(html, backend)
+            stats["seconds"] = time.perf_counter() - start
+            stats["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    return result, stats
@@ -0,0 +1,66 @@
+
+from .cache import fingerprint
+
+EMPTY_DETAILS = [("Brak ocen cząstkowych", "-", "-", "-")]
+LOADING_DETAILS = [("Wczytywanie ocen cząstkowych...", "-", "-", "-")]
+
+def fmt_grade(grade):
+    if not grade: return "-"
+    color = "red" if grade.failing else "green"
+    return f"[{color}]{grade.label}[/]"
+
+def fmt_partials(partials_list):
+    # None: lazy mode has not loaded this subject yet.
+    if partials_list is None:
+        return "[dim]…[/dim]"
+    if not partials_list:
+        return "[dim]-[/dim]"
+    return ", ".join(f"[cyan]{p.label}[/]" for p in partials_list)
+
+def row_cells(item):
+    return (
+        f"[bold]{item.subject}[/]", item.type, fmt_partials(item.partial_grades),
+        *(fmt_grade(g) for g in item.finals),
+    )
+
+def partial_rows(partials):
+    if partials is None:
+        return LOADING_DETAILS
+    if not partials:
+        return EMPTY_DETAILS
+    rows = []
+    for p in partials:
+        color = "red" if p.failing else "green"
+        rows.append((p.desc or "-", f"[{color}]{p.grade}[/]", p.date or "-", p.teacher or "-"))
+    return rows
+
+def detail_rows(item):
+    return partial_rows(item.partial_grades)
+
+class RenderedRow:
+    __slots__ = ("cells", "details")
+
+    def __init__(self, cells, details):
+        self.cells = cells
+        self.details = details
+
+class RenderModel:
+    # Formatted table cells memoized by record fingerprint: a refresh only
+    # formats subjects whose data actually changed. build() is safe to run in
+    # a worker thread; the UI just inserts the finished rows.
+    def __init__(self):
+        self.memo = {}
+
+    def build(self, data, prints=None):
+        memo = {}
+        rendered = {}
+        for key, item in data.items():
+            fp = prints.get(key) if prints else None
+            fp = fp or fingerprint(item)
+            row = self.memo.get(fp) or memo.get(fp)
+            if row is None:
+                row = RenderedRow(row_cells(item), detail_rows(item))
+            memo[fp] = row
+            rendered[key] = row
+        self.memo = memo
+        return rendered
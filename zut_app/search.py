@@ -0,0 +1,95 @@
+
+import unicodedata
+
+# "ł" has no decomposition, so NFKD alone leaves it in place.
+_FOLD = str.maketrans({"ł": "l", "Ł": "l"})
+
+def fold(text):
+    text = unicodedata.normalize("NFKD", (text or "").translate(_FOLD))
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+class SearchIndex:
+    # Folded subject/type/teacher text per subject, rebuilt only for the keys
+    # in a changeset. Queries narrowing the previous one (typing another
+    # letter) only scan the previous matches.
+    def __init__(self):
+        self.text = {}
+        self.order = []
+        self.last_query = None
+        self.last_matches = None
+
+    def update(self, data, changes=None):
+        if changes is None:
+            self.text = {key: self._entry(item) for key, item in data.items()}
+        else:
+            for key in changes["removed"]:
+                self.text.pop(key, None)
+            for key in changes["added"] + changes["modified"]:
+                if key in data:
+                    self.text[key] = self._entry(data[key])
+        self.order = list(data)
+        self.last_query = self.last_matches = None
+
+    def _entry(self, item):
+        teachers = {p.teacher for p in item.partial_grades or ()}
+        return fold(" ".join([item.subject, item.type, *sorted(teachers)]))
+
+    def search(self, query):
+        terms = fold(query).split()
+        if not terms:
+            return list(self.order)
+        if self.last_query is not None and fold(query).startswith(self.last_query):
+            candidates = self.last_matches
+        else:
+            candidates = self.order
+        matches = [key for key in candidates if all(t in self.text.get(key, "") for t in terms)]
+        self.last_query = fold(query)
+        self.last_matches = matches
+        return matches
+
+class GradeStats:
+    # Running totals over final grades. Each subject's contribution is kept,
+    # so a changeset is applied by swapping out only the changed subjects.
+    def __init__(self):
+        self.parts = {}
+        self.total = 0.0
+        self.graded = 0
+        self.failing = 0
+
+    def _contribution(self, item):
+        # The latest attempt counts towards the average.
+        latest = item.latest
+        return latest and latest.value, sum(1 for g in item.finals if g and g.failing)
+
+    def _add(self, key, item):
+        value, failing = self.parts[key] = self._contribution(item)
+        if value is not None:
+            self.total += value
+            self.graded += 1
+        self.failing += failing
+
+    def _remove(self, key):
+        value, failing = self.parts.pop(key)
+        if value is not None:
+            self.total -= value
+            self.graded -= 1
+        self.failing -= failing
+
+    def update(self, data, changes=None):
+        if changes is None:
+            self.parts = {}
+            self.total = 0.0
+            self.graded = self.failing = 0
+            keys = list(data)
+        else:
+            keys = changes["added"] + changes["modified"]
+            for key in changes["removed"] + keys:
+                if key in self.parts:
+                    self._remove(key)
+        for key in keys:
+            if key in data:
+                self._add(key, data[key])
+
+    @property
+    def average(self):
+        return self.total / self.graded if self.graded else None
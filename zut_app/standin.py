@@ -0,0 +1,267 @@
+
+import gzip
+import random
+import secrets
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from . import fixtures
+from .parsers import SEMESTER_FIELD
+
+PREFIX = "/WU/"
+CHUNK_SIZE = 16384
+AUTH_COOKIE = ".ASPXAUTH"
+LOGIN_FIELD = "ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$txtIdent"
+PASSWORD_FIELD = "ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$txtHaslo"
+EXPAND_ALL = "ctl00$ctl00$ContentPlaceHolder$RightContentPlaceHolder$chb_ExpColAll"
+PROTECTED = ("OcenyP.aspx", "OcenyCzast.aspx", "News.aspx")
+ERROR_PAGE = "<html><body><h1>Service Unavailable</h1></body></html>"
+NOT_FOUND_PAGE = "<html><body><h1>404 - Not Found</h1></body></html>"
+# Subjects per older semester when serving the recorded transcript.
+HISTORY_SUBJECTS = 8
+
+class Faults:
+    # Misbehaviour injected into every response, shared by the handler
+    # threads. An error starts a burst of `error_burst` consecutive 503s.
+    def __init__(self, latency=0.0, jitter=0.0, body_rate=0, session_ttl=0, error_rate=0.0, error_burst=1, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.body_rate = body_rate
+        self.session_ttl = session_ttl
+        self.error_rate = error_rate
+        self.error_burst = max(1, error_burst)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.burst_left = 0
+
+    def delay(self):
+        with self.lock:
+            return self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+
+    def fail(self):
+        with self.lock:
+            if not self.burst_left and self.error_rate and self.rng.random() < self.error_rate:
+                self.burst_left = self.error_burst
+            if self.burst_left:
+                self.burst_left -= 1
+                return True
+            return False
+
+class StandIn(ThreadingHTTPServer):
+    # Local e-Dziekanat: the login postback with cookie auth, OcenyP.aspx
+    # with its semester postback, OcenyCzast.aspx with its expand-all and
+    # per-subject postbacks, and News.aspx, serving `data` (the current
+    # semester) and `history` ([(value, label, data)] of older semesters)
+    # rendered into the recorded pages.
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), data=None, password=None, faults=None, verbose=False, seed=0,
+                 history=()):
+        super().__init__(address, Handler)
+        self.data = fixtures.expected() if data is None else data
+        self.history = {value: (label, semester) for value, label, semester in history}
+        current = str(len(self.history) + 1)
+        self.semesters = [(value, label) for value, (label, _) in self.history.items()]
+        self.semesters.append((current, fixtures.semester_label(len(self.semesters) + 1)))
+        self.password = password
+        self.faults = faults or Faults(seed=seed)
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+        self.pages = {
+            "Logowanie2.aspx": fixtures.page("login"),
+            "OcenyP.aspx": fixtures.final_page(self.data, self.rng, self.options(current)),
+            "OcenyCzast.aspx": fixtures.partial_page(self.data, False, self.rng),
+            "OcenyCzast.aspx#all": fixtures.partial_page(self.data, True, self.rng),
+            "News.aspx": fixtures.page("news"),
+        }
+        self.buttons = fixtures.expand_buttons(self.data)
+        self.bodies = {}
+        self.sessions = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{PREFIX}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def login(self):
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[token] = time.monotonic()
+        return token
+
+    def authorized(self, token):
+        with self.lock:
+            started = self.sessions.get(token)
+            if started is None:
+                return False
+            ttl = self.faults.session_ttl
+            if ttl and time.monotonic() - started > ttl:
+                del self.sessions[token]
+                self.stats["expired"] = self.stats.get("expired", 0) + 1
+                return False
+            return True
+
+    def options(self, selected):
+        return [(value, label, value == selected) for value, label in self.semesters]
+
+    def page(self, name):
+        if name not in self.pages:
+            # An older semester, or one subject expanded; rendered on first use.
+            base, _, arg = name.partition("#")
+            with self.lock:
+                if base == "OcenyP.aspx":
+                    html = fixtures.final_page(self.history[arg][1], self.rng, self.options(arg))
+                else:
+                    html = fixtures.partial_page(self.data, {arg}, self.rng)
+            self.pages[name] = html
+        return self.pages[name]
+
+    def body(self, name, compress):
+        if (name, compress) not in self.bodies:
+            raw = self.page(name).encode("utf-8")
+            self.bodies[name, compress] = gzip.compress(raw, 6) if compress else raw
+        return self.bodies[name, compress]
+
+    def final_postback(self, form):
+        if not form.get("__VIEWSTATE") or form.get("__EVENTTARGET") != SEMESTER_FIELD:
+            return "OcenyP.aspx"
+        value = form.get(SEMESTER_FIELD)
+        return f"OcenyP.aspx#{value}" if value in self.history else "OcenyP.aspx"
+
+    def partial_postback(self, form):
+        # ASP.NET answers a postback without valid view state with a fresh,
+        # collapsed grid.
+        if not form.get("__VIEWSTATE"):
+            return "OcenyCzast.aspx"
+        if form.get("__EVENTTARGET") == EXPAND_ALL:
+            return "OcenyCzast.aspx#all"
+        key = next((self.buttons[name] for name in form if name in self.buttons), None)
+        return f"OcenyCzast.aspx#{key}" if key else "OcenyCzast.aspx"
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "Microsoft-IIS/10.0"
+    sys_version = ""
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.dispatch("GET", {})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8", "replace")
+        form = {k: v[-1] for k, v in parse_qs(body, keep_blank_values=True).items()}
+        self.dispatch("POST", form)
+
+    def cookie(self, name):
+        cookies = SimpleCookie(self.headers.get("Cookie", ""))
+        return cookies[name].value if name in cookies else None
+
+    def dispatch(self, method, form):
+        server = self.server
+        path = urlsplit(self.path).path
+        page = path[len(PREFIX):] if path.startswith(PREFIX) else ""
+        server.count(f"{method} {page}")
+        delay = server.faults.delay()
+        if delay:
+            time.sleep(delay)
+        if server.faults.fail():
+            server.count("errors")
+            return self.send_html(503, ERROR_PAGE)
+
+        if page == "Logowanie2.aspx":
+            return self.post_login(form) if method == "POST" else self.send_page(page)
+        if page not in PROTECTED:
+            return self.send_html(404, NOT_FOUND_PAGE)
+        if not server.authorized(self.cookie(AUTH_COOKIE)):
+            server.count("redirects")
+            return self.redirect(f"{PREFIX}Logowanie2.aspx?ReturnUrl={quote(path, safe='')}")
+        if page == "OcenyP.aspx" and method == "POST":
+            return self.send_page(server.final_postback(form))
+        if page == "OcenyCzast.aspx" and method == "POST":
+            return self.send_page(server.partial_postback(form))
+        self.send_page(page)
+
+    def post_login(self, form):
+        server = self.server
+        ok = bool(form.get(LOGIN_FIELD)) and bool(form.get("__VIEWSTATE"))
+        if server.password is not None:
+            ok = ok and form.get(PASSWORD_FIELD) == server.password
+        if not ok:
+            server.count("rejected")
+            return self.send_page("Logowanie2.aspx")
+        token = server.login()
+        self.redirect(f"{PREFIX}News.aspx", f"{AUTH_COOKIE}={token}; path=/; HttpOnly")
+
+    def redirect(self, location, cookie=None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_page(self, name):
+        compress = "gzip" in self.headers.get("Accept-Encoding", "")
+        self.send_body(200, self.server.body(name, compress), compress)
+
+    def send_html(self, status, html):
+        self.send_body(status, html.encode("utf-8"), False)
+
+    def send_body(self, status, body, compress):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        rate = self.server.faults.body_rate
+        try:
+            # Streaming clients hang up once the grid is parsed.
+            for i in range(0, len(body), CHUNK_SIZE):
+                chunk = body[i:i + CHUNK_SIZE]
+                self.wfile.write(chunk)
+                if rate:
+                    self.wfile.flush()
+                    time.sleep(len(chunk) / rate)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+def run_standin(host="127.0.0.1", port=8080, subjects=None, partials=None, seed=0, password=None,
+                faults=None, verbose=False, semesters=1):
+    data = fixtures.transcript(subjects, partials or 0, seed) if subjects else None
+    history = fixtures.semesters(semesters - 1, subjects or HISTORY_SUBJECTS, partials or 0, seed)
+    server = StandIn((host, port), data, password, faults, verbose, seed, history)
+    print(f"Stand-in e-Dziekanat with {len(server.data)} subjects in semester {len(server.semesters)} "
+          f"at {server.base_url}", file=sys.stderr)
+    print(f"Point zutui at it with ZUTUI_BASE_URL={server.base_url} (or \"base_url\" in config.json).",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Requests: {server.stats}", file=sys.stderr)
+    return 0
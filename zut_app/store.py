@@ -0,0 +1,350 @@
+
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+from .config import APP_DIR
+from .model import SLOTS, FinalGrade, PartialGrade, Subject, dump_data, load_data
+
+DB_FILE = os.path.join(APP_DIR, "grades.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    taken_at REAL NOT NULL,
+    changes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    subject TEXT NOT NULL,
+    type TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS final_grades (
+    id INTEGER PRIMARY KEY,
+    subject_id INTEGER NOT NULL REFERENCES subjects(id),
+    slot TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    date TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    recorded_at REAL NOT NULL,
+    superseded_at REAL
+);
+CREATE TABLE IF NOT EXISTS partial_grades (
+    id INTEGER PRIMARY KEY,
+    subject_id INTEGER NOT NULL REFERENCES subjects(id),
+    position INTEGER NOT NULL,
+    grade TEXT NOT NULL,
+    description TEXT NOT NULL,
+    date TEXT NOT NULL,
+    teacher TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    recorded_at REAL NOT NULL,
+    superseded_at REAL
+);
+CREATE TABLE IF NOT EXISTS partial_fetches (
+    subject_id INTEGER PRIMARY KEY REFERENCES subjects(id),
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS news (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL,
+    body TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS semesters (
+    id TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_final_current ON final_grades(subject_id, superseded_at);
+CREATE INDEX IF NOT EXISTS idx_final_recorded ON final_grades(recorded_at);
+CREATE INDEX IF NOT EXISTS idx_partial_current ON partial_grades(subject_id, superseded_at);
+CREATE INDEX IF NOT EXISTS idx_partial_recorded ON partial_grades(recorded_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_taken ON snapshots(taken_at);
+"""
+
+class GradeStore:
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        if self.get_meta("partials_known") is None:
+            # Stores written before the lazy mode's "not loaded" state was
+            # kept: every subject's partial grades count as known.
+            with self.connect() as conn, conn:
+                conn.execute("INSERT OR IGNORE INTO partial_fetches (subject_id, fetched_at) SELECT id, 0 FROM subjects")
+            self.set_meta("partials_known", "1")
+
+    @contextmanager
+    def connect(self):
+        # One short-lived connection per operation: the refresh workers, the
+        # UI thread and other zutui processes all share the file through WAL.
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            yield conn
+        finally:
+            conn.close()
+
+    def get_meta(self, key, default=None):
+        with self.connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.connect() as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def fetched(self):
+        # {"at", "source", "base_url"} of the last successful fetch, if any.
+        value = self.get_meta("fetched")
+        return json.loads(value) if value else None
+
+    def mark_fetched(self, source, base_url=None, at=None):
+        info = {"at": time.time() if at is None else at, "source": source, "base_url": base_url}
+        self.set_meta("fetched", json.dumps(info))
+
+    def import_json(self, json_path):
+        if self.get_meta("json_imported") or not os.path.exists(json_path):
+            return False
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # Keep the broken file around instead of silently dropping it.
+            print(f"Failed to import cache {json_path}: {e}", file=sys.stderr)
+            try: os.replace(json_path, json_path + ".corrupt")
+            except OSError: pass
+            data = {}
+        if data:
+            self.save(load_data(data), {"imported": json_path})
+            self.mark_fetched("import", at=os.path.getmtime(json_path))
+        self.set_meta("json_imported", str(time.time()))
+        return True
+
+    def load(self):
+        with self.connect() as conn:
+            subjects = conn.execute(
+                "SELECT id, key, subject, type FROM subjects WHERE active=1 ORDER BY position").fetchall()
+            finals = {sid: [None] * len(SLOTS) for sid, *_ in subjects}
+            # Without a partial_fetches row the lazy mode never loaded them.
+            known = {sid for (sid,) in conn.execute("SELECT subject_id FROM partial_fetches")}
+            partials = {sid: [] if sid in known else None for sid, *_ in subjects}
+            for sid, slot, grade, date in conn.execute(
+                    "SELECT subject_id, slot, grade, date FROM final_grades WHERE superseded_at IS NULL"):
+                if sid in finals and slot in SLOTS:
+                    finals[sid][SLOTS.index(slot)] = FinalGrade(grade, date)
+            for sid, grade, desc, date, teacher in conn.execute(
+                    "SELECT subject_id, grade, description, date, teacher FROM partial_grades "
+                    "WHERE superseded_at IS NULL ORDER BY subject_id, position"):
+                if sid in partials:
+                    if partials[sid] is None:
+                        partials[sid] = []
+                    partials[sid].append(PartialGrade(grade, desc, date, teacher))
+        return {key: Subject(subject, ctype, finals[sid], partials[sid], key)
+                for sid, key, subject, ctype in subjects}
+
+    def save(self, data, changes=None):
+        if not data:
+            return None
+        now = time.time()
+        with self.connect() as conn, conn:
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots (taken_at, changes) VALUES (?, ?)",
+                (now, json.dumps(changes or {}, ensure_ascii=False))).lastrowid
+            before = conn.total_changes
+
+            seen = set()
+            for position, (key, item) in enumerate(data.items()):
+                sid = self._upsert_subject(conn, key, item, position)
+                seen.add(sid)
+                self._save_finals(conn, sid, item.finals, snapshot_id, now)
+                if item.partial_grades is not None:
+                    self._save_partials(conn, sid, item.partial_grades, snapshot_id, now)
+                    # Known now; a full refresh's grades count as stale (0).
+                    conn.execute("INSERT OR IGNORE INTO partial_fetches (subject_id, fetched_at) VALUES (?, 0)",
+                                 (sid,))
+
+            for (sid,) in conn.execute("SELECT id FROM subjects WHERE active=1").fetchall():
+                if sid not in seen:
+                    conn.execute("UPDATE subjects SET active=0 WHERE id=?", (sid,))
+
+            # Only keep snapshots for refreshes that actually changed something.
+            if conn.total_changes - before == 0:
+                conn.execute("DELETE FROM snapshots WHERE id=?", (snapshot_id,))
+                return None
+        return snapshot_id
+
+    def _upsert_subject(self, conn, key, item, position):
+        row = conn.execute("SELECT id, subject, type, position, active FROM subjects WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return conn.execute(
+                "INSERT INTO subjects (key, subject, type, position) VALUES (?, ?, ?, ?)",
+                (key, item.subject, item.type, position)).lastrowid
+        if row[1:] != (item.subject, item.type, position, 1):
+            conn.execute("UPDATE subjects SET subject=?, type=?, position=?, active=1 WHERE id=?",
+                         (item.subject, item.type, position, row[0]))
+        return row[0]
+
+    def _save_finals(self, conn, sid, finals, snapshot_id, now):
+        current = {slot: (rid, grade, date) for rid, slot, grade, date in conn.execute(
+            "SELECT id, slot, grade, date FROM final_grades WHERE subject_id=? AND superseded_at IS NULL", (sid,))}
+        for slot, new in zip(SLOTS, finals):
+            old = current.get(slot)
+            new_val = new.astuple() if new else None
+            old_val = old[1:] if old else None
+            if new_val == old_val:
+                continue
+            if old:
+                conn.execute("UPDATE final_grades SET superseded_at=? WHERE id=?", (now, old[0]))
+            if new_val:
+                conn.execute(
+                    "INSERT INTO final_grades (subject_id, slot, grade, date, snapshot_id, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (sid, slot, *new_val, snapshot_id, now))
+
+    def _save_partials(self, conn, sid, partials, snapshot_id, now):
+        pool = {}
+        for row in conn.execute(
+                "SELECT id, position, grade, description, date, teacher FROM partial_grades "
+                "WHERE subject_id=? AND superseded_at IS NULL ORDER BY position", (sid,)):
+            pool.setdefault(row[2:], []).append(row[:2])
+
+        for position, p in enumerate(partials):
+            fields = p.astuple()
+            matches = pool.get(fields)
+            if matches:
+                rid, old_position = matches.pop(0)
+                if old_position != position:
+                    conn.execute("UPDATE partial_grades SET position=? WHERE id=?", (position, rid))
+            else:
+                conn.execute(
+                    "INSERT INTO partial_grades (subject_id, position, grade, description, date, teacher, "
+                    "snapshot_id, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sid, position, *fields, snapshot_id, now))
+
+        for leftovers in pool.values():
+            for rid, _ in leftovers:
+                conn.execute("UPDATE partial_grades SET superseded_at=? WHERE id=?", (now, rid))
+
+    def save_subject_partials(self, key, partials, fetched_at=None):
+        # Lazy mode stores one subject's partial grades at a time, each with
+        # its own freshness timestamp.
+        now = fetched_at or time.time()
+        with self.connect() as conn, conn:
+            row = conn.execute("SELECT id FROM subjects WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots (taken_at, changes) VALUES (?, ?)",
+                (now, json.dumps({"added": [], "removed": [], "modified": [key]}, ensure_ascii=False))).lastrowid
+            before = conn.total_changes
+            self._save_partials(conn, row[0], partials, snapshot_id, now)
+            changed = conn.total_changes - before
+            conn.execute("INSERT OR REPLACE INTO partial_fetches (subject_id, fetched_at) VALUES (?, ?)",
+                         (row[0], now))
+            if not changed:
+                conn.execute("DELETE FROM snapshots WHERE id=?", (snapshot_id,))
+                return None
+        return snapshot_id
+
+    def partials_fetched(self):
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT s.key, f.fetched_at FROM partial_fetches f JOIN subjects s ON s.id = f.subject_id").fetchall()
+        return dict(rows)
+
+    def save_news(self, items):
+        # Items arrive newest first; insert oldest first so seq follows age.
+        now = time.time()
+        with self.connect() as conn, conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO news (id, title, date, body, seen_at) VALUES (?, ?, ?, ?, ?)",
+                [(i["id"], i["title"], i["date"], i["body"], now) for i in reversed(items)])
+            added = conn.total_changes - before
+            if items:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('news_hwm', ?)", (items[0]["id"],))
+        return added
+
+    def news(self, limit=100):
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT id, title, date, body, seen_at FROM news ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+        return [{"id": nid, "title": title, "date": date, "body": body, "seen_at": seen_at}
+                for nid, title, date, body, seen_at in rows]
+
+    def known_news(self, limit=50):
+        # The high-water mark plus the most recent ids, in case the newest
+        # announcement gets taken down.
+        with self.connect() as conn:
+            ids = {nid for (nid,) in conn.execute("SELECT id FROM news ORDER BY seq DESC LIMIT ?", (limit,))}
+        hwm = self.get_meta("news_hwm")
+        return ids | {hwm} if hwm else ids
+
+    def save_semester(self, semester_id, label, position, data):
+        # Closed semesters only: written once, then read back as they are.
+        with self.connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO semesters (id, label, position, data, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (semester_id, label, position, json.dumps(dump_data(data), ensure_ascii=False), time.time()))
+
+    def semesters(self):
+        with self.connect() as conn:
+            rows = conn.execute("SELECT id, label, data FROM semesters ORDER BY position").fetchall()
+        return [(sid, label, load_data(json.loads(data))) for sid, label, data in rows]
+
+    def closed_semesters(self):
+        with self.connect() as conn:
+            return {sid for (sid,) in conn.execute("SELECT id FROM semesters")}
+
+    def partials_since(self, since):
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT s.key, s.subject, s.type, p.grade, p.description, p.date, p.teacher, p.recorded_at "
+                "FROM partial_grades p JOIN subjects s ON s.id = p.subject_id "
+                "WHERE p.recorded_at > ? ORDER BY p.recorded_at, p.position", (since,)).fetchall()
+        return [{
+            "key": key, "subject": subject, "type": ctype, "grade": grade,
+            "desc": desc, "date": date, "teacher": teacher, "recorded_at": recorded_at,
+        } for key, subject, ctype, grade, desc, date, teacher, recorded_at in rows]
+
+    def grade_history(self, key):
+        with self.connect() as conn:
+            row = conn.execute("SELECT id FROM subjects WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return []
+            finals = conn.execute(
+                "SELECT 'final', slot, grade, date, '', recorded_at, superseded_at FROM final_grades "
+                "WHERE subject_id=?", row).fetchall()
+            partials = conn.execute(
+                "SELECT 'partial', description, grade, date, teacher, recorded_at, superseded_at "
+                "FROM partial_grades WHERE subject_id=?", row).fetchall()
+        history = [{
+            "kind": kind, "label": label, "grade": grade, "date": date, "teacher": teacher,
+            "recorded_at": recorded_at, "superseded_at": superseded_at,
+        } for kind, label, grade, date, teacher, recorded_at, superseded_at in finals + partials]
+        history.sort(key=lambda h: h["recorded_at"])
+        return history
+
+    def snapshots(self, since=0, limit=50):
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT id, taken_at, changes FROM snapshots WHERE taken_at > ? ORDER BY taken_at DESC LIMIT ?",
+                (since, limit)).fetchall()
+        return [{"id": sid, "taken_at": taken_at, "changes": json.loads(changes)} for sid, taken_at, changes in rows]
@@ -1,180 +1,810 @@
 
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import functools
+import httpx
+from http.cookiejar import Cookie
 import json
 import os
+import random
+import sys
+import time
 
-USER_HOME = os.path.expanduser("~")
-APP_DIR = os.path.join(USER_HOME, "zutui")
-if not os.path.exists(APP_DIR):
-    os.makedirs(APP_DIR)
+from . import cache, parsers
+from .cache import compute_changeset, fingerprint, is_empty_changeset
+from .config import APP_DIR, BASE_URL, resolve_base_url
+from .metrics import METRICS
 
-CACHE_FILE = os.path.join(APP_DIR, "grades_cache.json")
-TIMEOUT = 10 
+SESSION_FILE = os.path.join(APP_DIR, "session.json")
+TIMEOUT = 10
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 15
+REFRESH_DEADLINE = 60
+MAX_CONNECTIONS = 4
+KEEPALIVE_EXPIRY = 60
+# Read at most this much after a streamed grid to keep the connection.
+DRAIN_LIMIT = 256 * 1024
+PARTIAL_TTL = 3600
+FORM_STATS = ("hit", "miss", "stale")
+SEMESTER_CONCURRENCY = 3
+# The closed-semester crawl runs after the refresh, on its own budget.
+SEMESTER_DEADLINE = 120
+# So does News.aspx.
+NEWS_DEADLINE = 20
+PAGES = {
+    "LOGIN": "Logowanie2.aspx",
+    "FINAL": "OcenyP.aspx",
+    "PARTIAL": "OcenyCzast.aspx",
+    "NEWS": "News.aspx",
+}
 
-class ZUT:
-    URLS = {
-        "LOGIN": "https://edziekanat.zut.edu.pl/WU/Logowanie2.aspx",
-        "FINAL": "https://edziekanat.zut.edu.pl/WU/OcenyP.aspx",
-        "PARTIAL": "https://edziekanat.zut.edu.pl/WU/OcenyCzast.aspx",
-        "NEWS": "https://edziekanat.zut.edu.pl/WU/News.aspx"
-    }
-
-    def __init__(self, username, password):
+class SessionExpired(Exception):
+    pass
+
+class FetchError(Exception):
+    pass
+
+class CircuitOpen(FetchError):
+    pass
+
+class RetryPolicy:
+    # Exponential backoff with jitter; only idempotent GETs are retried.
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=8, jitter=0.5):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * random.uniform(1 - self.jitter, 1)
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failed requests and rejects requests
+    # until `cooldown` has passed; then one trial request decides.
+    def __init__(self, threshold=5, cooldown=300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def before_request(self):
+        if self.is_open:
+            retry_in = self.cooldown - (time.monotonic() - self.opened_at)
+            raise CircuitOpen(f"e-Dziekanat unavailable, retrying in {retry_in:.0f}s")
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+def _make_cookie(c):
+    domain = c.get("domain") or ""
+    return Cookie(
+        version=0, name=c["name"], value=c["value"], port=None, port_specified=False,
+        domain=domain, domain_specified=bool(domain), domain_initial_dot=domain.startswith("."),
+        path=c.get("path") or "/", path_specified=True, secure=bool(c.get("secure")),
+        expires=c.get("expires"), discard=c.get("expires") is None,
+        comment=None, comment_url=None, rest={},
+    )
+
+def page_urls(base_url):
+    base = base_url.rstrip("/") + "/"
+    return {name: base + page for name, page in PAGES.items()}
+
+class AsyncZUT:
+    URLS = page_urls(BASE_URL)
+
+    def __init__(self, username, password, persist=True, rate_limiter=None,
+                 retry=None, breaker=None, deadline=REFRESH_DEADLINE, metrics=None, lazy_partials=False,
+                 fetch_news=False, base_url=None, all_semesters=False, source="app"):
         self.username = username
         self.password = password
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Origin": "https://edziekanat.zut.edu.pl",
-        })
+        self.base_url = resolve_base_url(base_url)
+        self.URLS = page_urls(self.base_url)
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.deadline = deadline
+        self.metrics = metrics or METRICS
+        # Lazy mode fetches the collapsed partial-grade grid and expands one
+        # subject at a time instead of posting chb_ExpColAll on every refresh.
+        self.lazy_partials = lazy_partials
+        # News.aspx is polled together with the grades, on the same session.
+        self.fetch_news = fetch_news
+        # Also crawl the closed semesters of OcenyP.aspx (once each, cached).
+        self.all_semesters = all_semesters
+        # Batch clients keep their session and results to themselves.
+        self.persist = persist
+        # Recorded with the cache so readers know who fetched it.
+        self.source = source
+        # One pooled keep-alive client per account; all requests of a refresh
+        # reuse its connections.
+        self.session = httpx.AsyncClient(
+            headers={
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                "Origin": str(httpx.URL(self.base_url).copy_with(path="/", query=None)).rstrip("/"),
+            },
+            timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT, read=READ_TIMEOUT),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS,
+                                keepalive_expiry=KEEPALIVE_EXPIRY),
+            event_hooks={"request": [rate_limiter]} if rate_limiter else None,
+        )
         self.is_logged_in = False
+        self.timings = {}
+        self.sizes = {}
+        self.fingerprints = {}
+        self.parse_stats = {}
+        self.parse_executor = None
+        self.last_changes = None
+        self.last_error = None
+        self.data = {}
+        # Hidden ASP.NET fields (__VIEWSTATE, __EVENTVALIDATION, ...) per URL,
+        # replayed so a postback does not need a GET first.
+        self.form_state = {}
+        self.form_stats = dict.fromkeys(FORM_STATS, 0)
+        self.partial_index = {}
+        self.partial_cache = None
+        self.news_known = set()
+        self.last_news = []
+        # [(id, label, selected)] of the semester drop-down; closed semesters
+        # fetched by this client as {id: (label, data)}.
+        self.semesters = []
+        self.history = {}
+        self.crawl_task = None
+        self.news_task = None
+
+    async def close(self):
+        for task in (self.crawl_task, self.news_task):
+            if task is not None:
+                task.cancel()
+        await self.session.aclose()
 
     def load_cache(self):
-        if os.path.exists(CACHE_FILE):
-            try:
-                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+        data = cache.load_cache()
+        self.track(data)
+        return data
+
+    def track(self, data):
+        self.fingerprints = {k: fingerprint(v) for k, v in data.items()}
+
+    def save_cache(self, data, changes=None):
+        # An unchanged refresh still renews the fetch time.
+        if changes is None or not is_empty_changeset(changes):
+            cache.save_cache(data, changes)
+        cache.mark_fetched(self.source, self.base_url)
 
-    def save_cache(self, data):
+    def save_session(self):
+        if not self.persist: return
+        cookies = [{
+            "name": c.name, "value": c.value, "domain": c.domain,
+            "path": c.path, "expires": c.expires, "secure": c.secure,
+        } for c in self.session.cookies.jar]
         try:
-            with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            with open(SESSION_FILE, 'w', encoding='utf-8') as f:
+                json.dump({"username": self.username, "base_url": self.base_url, "saved_at": time.time(), "cookies": cookies,
+                           "forms": self.form_state}, f)
         except Exception as e:
-            print(f"Failed to save cache: {e}")
+            print(f"Failed to save session: {e}", file=sys.stderr)
 
-    def _get_hidden_inputs(self, soup):
-        return {inp.get('name'): inp.get('value') for inp in soup.find_all('input', type='hidden') if inp.get('name')}
+    async def restore_session(self, verify=True):
+        if not self.persist or not os.path.exists(SESSION_FILE): return False
+        try:
+            with open(SESSION_FILE, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except:
+            return False
+        if saved.get("username") != self.username: return False
+        if saved.get("base_url", BASE_URL) != self.base_url: return False
+        self.form_state.update(saved.get("forms") or {})
 
-    def login(self):
+        now = time.time()
+        for c in saved.get("cookies", []):
+            if c.get("expires") and c["expires"] <= now: continue
+            self.session.cookies.jar.set_cookie(_make_cookie(c))
+        if not len(self.session.cookies.jar): return False
+
+        # Unverified, the first grade fetch doubles as the check: a dead
+        # session comes back as SessionExpired and _refresh logs in again.
+        if not verify or await self.check_session():
+            self.is_logged_in = True
+            return True
+        self.session.cookies.clear()
+        return False
+
+    async def check_session(self):
         try:
-            self.session.headers.update({"Referer": self.URLS["LOGIN"]})
-            r = self.session.get(self.URLS["LOGIN"], timeout=TIMEOUT)
-            soup = BeautifulSoup(r.text, 'html.parser')
-            payload = self._get_hidden_inputs(soup)
-
-            payload.update({
-                'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$txtIdent': self.username,
-                'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$txtHaslo': self.password,
-                'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$butLoguj': 'Zaloguj',
-                'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$rbKto': 'student'
-            })
-
-            post_response = self.session.post(self.URLS["LOGIN"], data=payload, timeout=TIMEOUT)
-            
-            if ".ASPX" in str(self.session.cookies.get_dict()) or "Wyloguj" in post_response.text:
-                self.is_logged_in = True
-                return True
+            r = await self._request("GET", self.URLS["NEWS"], phase="check_session", follow_redirects=False)
+            return r.status_code == 200 and not self._is_login_page(r)
+        except FetchError:
             return False
+
+    async def ensure_login(self, verify=True):
+        if self.is_logged_in: return True
+        return await self.restore_session(verify) or await self.login()
+
+    def _is_login_page(self, resp):
+        if resp.is_redirect:
+            return "Logowanie" in resp.headers.get("Location", "")
+        return bool(resp.history) and "Logowanie" in str(resp.url)
+
+    def _check_expired(self, resp):
+        if self._is_login_page(resp):
+            self.is_logged_in = False
+            raise SessionExpired()
+
+    async def _request(self, method, url, phase=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = await self._send(method, url, **kwargs)
+        finally:
+            if phase:
+                self.timings[phase] = time.perf_counter() - start
+        if phase:
+            # Bytes on the wire, i.e. after Content-Encoding compression.
+            self.sizes[phase] = resp.num_bytes_downloaded or len(resp.content)
+        return resp
+
+    async def _open(self, method, url, stream, follow_redirects=httpx.USE_CLIENT_DEFAULT, **kwargs):
+        request = self.session.build_request(method, url, **kwargs)
+        return await self.session.send(request, stream=stream, follow_redirects=follow_redirects)
+
+    async def _send(self, method, url, stream=False, **kwargs):
+        self.breaker.before_request()
+        attempts = self.retry.attempts if method == "GET" else 1
+        for attempt in range(attempts):
+            try:
+                resp = await self._open(method, url, stream, **kwargs)
+                if resp.status_code >= 500 or resp.status_code == 429:
+                    if stream:
+                        await resp.aclose()
+                    raise FetchError(f"{method} {url}: HTTP {resp.status_code}")
+                self.breaker.record_success()
+                return resp
+            except (httpx.TransportError, FetchError) as e:
+                error = e
+            if attempt + 1 < attempts:
+                await asyncio.sleep(self.retry.delay(attempt))
+        self.breaker.record_failure()
+        if isinstance(error, FetchError):
+            raise error
+        raise FetchError(f"{method} {url}: {type(error).__name__}") from error
+
+    def _streaming(self):
+        # A process pool (batch) parses whole pages; otherwise grade pages are
+        # parsed chunk by chunk while they download.
+        return self.parse_executor is None and parsers.can_stream()
+
+    async def _drain(self, chunks):
+        # The rest of the body is not parsed, only read, so the keep-alive
+        # connection goes back to the pool; past DRAIN_LIMIT it is dropped.
+        tail = 0
+        try:
+            async for chunk in chunks:
+                tail += len(chunk)
+                if tail > DRAIN_LIMIT:
+                    break
+        except httpx.TransportError:
+            pass
+
+    async def _stream_grid(self, page, stream_cls, method, url, phase, until=None, complete=True, **kwargs):
+        # complete: the grid must end in the body; a cut-off one is an error
+        # rather than a shorter result.
+        start = time.perf_counter()
+        try:
+            resp = await self._send(method, url, stream=True, **kwargs)
+            try:
+                self._check_expired(resp)
+                grid = stream_cls(resp.encoding)
+                chunks = resp.aiter_bytes()
+                stopped = False
+                async for chunk in chunks:
+                    emitted = grid.feed(chunk)
+                    # Everything after the grid (or the wanted row) is skipped.
+                    if grid.done or until in emitted:
+                        stopped = True
+                        break
+                if stopped:
+                    await self._drain(chunks)
+                elif complete and grid.grid is not None:
+                    raise FetchError(f"{method} {url}: response ended inside the grid")
+            except httpx.TransportError as e:
+                raise FetchError(f"{method} {url}: {type(e).__name__}") from e
+            finally:
+                await resp.aclose()
+        finally:
+            self.timings[phase] = time.perf_counter() - start
+        self.sizes[phase] = resp.num_bytes_downloaded or grid.bytes
+        self.parse_stats[page] = grid.stats()
+        self.timings[f"parse_{page}"] = grid.seconds
+        return grid
+
+    def _cached_form(self, url):
+        form = self.form_state.get(url)
+        self.form_stats["hit" if form else "miss"] += 1
+        return dict(form) if form else None
+
+    def _drop_form(self, url):
+        if self.form_state.pop(url, None) is not None:
+            self.form_stats["stale"] += 1
+
+    def _keep_form(self, url, form):
+        # A streamed page may end before fields rendered after the grid; keep
+        # the older state unless the new one has every field it had.
+        known = self.form_state.get(url)
+        if form.get("__VIEWSTATE") and (not known or known.keys() <= form.keys()):
+            self.form_state[url] = form
+
+    async def _fetch_form(self, url, phase, page, headers, check=True):
+        resp = await self._request("GET", url, phase=phase, headers=headers)
+        if check:
+            self._check_expired(resp)
+        form = await self._parse(page, parsers.parse_hidden_inputs, resp.text)
+        self.form_state.pop(url, None)
+        self._keep_form(url, form)
+        return dict(form)
+
+    def _referer(self):
+        return {"Referer": self.URLS["NEWS"]}
+
+    async def _timed(self, phase, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.timings[phase] = time.perf_counter() - start
+
+    async def _parse(self, page, func, html):
+        # Parsing is CPU work; keep it off the event loop (and on a process
+        # pool when parse_executor is set).
+        loop = asyncio.get_running_loop()
+        result, stats = await loop.run_in_executor(self.parse_executor, parsers.profiled, func, html)
+        self.parse_stats[page] = stats
+        self.timings[f"parse_{page}"] = stats["seconds"]
+        return result
+
+    async def _submit_login(self, payload, headers):
+        payload.update({
+            'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$txtIdent': self.username,
+            'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$txtHaslo': self.password,
+            'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$butLoguj': 'Zaloguj',
+            'ctl00$ctl00$ContentPlaceHolder$MiddleContentPlaceHolder$rbKto': 'student'
+        })
+
+        # A successful login sets the auth cookie on its 302 to News.aspx; the
+        # refresh fetches that page itself, so the redirect is not followed.
+        post_response = await self._request("POST", self.URLS["LOGIN"], phase="login_post", data=payload,
+                                            headers=headers, follow_redirects=False)
+        authorized = any(".ASPX" in name for name in post_response.cookies)
+        if not authorized and post_response.next_request is not None:
+            post_response = await self._request("GET", str(post_response.next_request.url), phase="login_redirect",
+                                                headers=headers)
+
+        if authorized or "Wyloguj" in post_response.text:
+            self.is_logged_in = True
+        return self.is_logged_in
+
+    async def login(self):
+        self.is_logged_in = False
+        try:
+            url = self.URLS["LOGIN"]
+            headers = {"Referer": url}
+            payload = self._cached_form(url)
+            if payload is not None:
+                try:
+                    await self._submit_login(payload, headers)
+                except FetchError:
+                    pass
+                if not self.is_logged_in:
+                    # Stale state (or a wrong password): retry with a fresh form.
+                    self._drop_form(url)
+            if not self.is_logged_in:
+                payload = await self._fetch_form(url, "login_get", "login_form", headers, check=False)
+                await self._submit_login(payload, headers)
+
+            if self.is_logged_in:
+                self.save_session()
+            else:
+                self.last_error = "login rejected"
         except Exception as e:
-            print(f"Login Error: {e}")
-            return False
+            self.last_error = str(e)
+            print(f"Login Error: {e}", file=sys.stderr)
+        phases = ("login_get", "parse_login_form", "login_post", "login_redirect")
+        self.metrics.record("login", {k: self.timings[k] for k in phases if k in self.timings},
+                            {k: self.sizes[k] for k in phases if k in self.sizes}, self.form_stats,
+                            ok=self.is_logged_in, error=None if self.is_logged_in else self.last_error)
+        return self.is_logged_in
 
-    def get_final_grades(self):
+    async def get_final_grades(self):
         if not self.is_logged_in: return {}
-        self.session.headers.update({"Referer": self.URLS["NEWS"]})
-        try:
-            resp = self.session.get(self.URLS["FINAL"], timeout=TIMEOUT)
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            data = {}
-            table = soup.find('table', id='ctl00_ctl00_ContentPlaceHolder_RightContentPlaceHolder_dgDane')
-            if not table: return data
-
-            for row in table.find_all('tr', class_='gridDane'):
-                cells = row.find_all('td')
-                if not cells: continue
-
-                def parse_cell(c):
-                    txt = [t.strip() for t in c.stripped_strings]
-                    if not txt: return None
-                    return {"grade": txt[0], "date": txt[1] if len(txt)>1 else ""}
-
-                subject = cells[0].get_text(strip=True)
-                ctype = cells[1].get_text(strip=True)
-                key = f"{subject}_{ctype}"
-
-                data[key] = {
-                    "subject": subject,
-                    "type": ctype,
-                    "final_grades": {
-                        "term_1": parse_cell(cells[5]),
-                        "retake_1": parse_cell(cells[6]),
-                        "retake_2": parse_cell(cells[7]),
-                        "commission": parse_cell(cells[8]),
-                    },
-                    "partial_grades": []
-                }
-            return data
-        except Exception:
+        url = self.URLS["FINAL"]
+        if self._streaming():
+            grid = await self._stream_grid("final", parsers.FinalGridStream, "GET", url,
+                                           "final_get", headers=self._referer())
+            self.semesters = grid.semesters
+            self._keep_form(url, grid.form)
+            return grid.result
+        resp = await self._request("GET", url, phase="final_get", headers=self._referer())
+        self._check_expired(resp)
+        if not self.all_semesters:
+            return await self._parse("final", parsers.parse_final_grades, resp.text)
+        form, self.semesters, data = await self._parse("final", parsers.parse_final_page, resp.text)
+        self._keep_form(url, form)
+        return data
+
+    async def get_semester(self, semester_id):
+        # The semester drop-down posts back to OcenyP.aspx.
+        url = self.URLS["FINAL"]
+        payload = dict(self.form_state.get(url) or {})
+        payload.update({
+            '__EVENTTARGET': parsers.SEMESTER_FIELD,
+            '__EVENTARGUMENT': '',
+            parsers.SEMESTER_FIELD: semester_id,
+        })
+        phase = f"semester_{semester_id}"
+        headers = {"Referer": url}
+        if self._streaming():
+            grid = await self._stream_grid(phase, parsers.FinalGridStream, "POST", url, phase,
+                                           data=payload, headers=headers)
+            semesters, data = grid.semesters, grid.result
+        else:
+            resp = await self._request("POST", url, phase=phase, data=payload, headers=headers)
+            self._check_expired(resp)
+            _, semesters, data = await self._parse(phase, parsers.parse_final_page, resp.text)
+        # A rejected postback renders the default (current) semester.
+        if (semester_id, True) not in {(sid, selected) for sid, _, selected in semesters}:
+            raise FetchError(f"semester {semester_id}: postback rejected")
+        return data
+
+    async def crawl_semesters(self):
+        # Closed semesters never change: each one is fetched once, in
+        # parallel under SEMESTER_CONCURRENCY, and only read from the cache
+        # afterwards. Routine polls only fetch the current semester.
+        current = next(((sid, label) for sid, label, selected in self.semesters if selected), None)
+        if current is None:
             return {}
+        if self.persist:
+            await asyncio.to_thread(cache.set_current_semester, *current)
+            done = await asyncio.to_thread(cache.closed_semesters)
+        else:
+            done = set(self.history)
+        missing = [(position, sid, label) for position, (sid, label, selected) in enumerate(self.semesters)
+                   if not selected and sid not in done]
+        semaphore = asyncio.Semaphore(SEMESTER_CONCURRENCY)
 
-    def get_partial_grades(self):
-        if not self.is_logged_in: return {}
+        async def fetch(position, sid, label):
+            async with semaphore:
+                try:
+                    data = await self.get_semester(sid)
+                except (FetchError, SessionExpired) as e:
+                    # Retried on the next refresh.
+                    print(f"Semester {label}: {e or type(e).__name__}", file=sys.stderr)
+                    return
+            self.history[sid] = (label, data)
+            if self.persist:
+                await asyncio.to_thread(cache.save_semester, sid, label, position, data)
+
+        await asyncio.gather(*(fetch(*semester) for semester in missing))
+        return {sid: self.history[sid] for _, sid, _ in missing if sid in self.history}
+
+    def _start_crawl(self):
+        # Best effort, once the current semester is saved: a slow or failing
+        # crawl never costs the refresh its result.
+        if self.crawl_task is None or self.crawl_task.done():
+            self.crawl_task = asyncio.ensure_future(self._crawl())
+
+    async def _crawl(self):
+        start = time.perf_counter()
+        error = None
         try:
-            resp = self.session.get(self.URLS["PARTIAL"], timeout=TIMEOUT)
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            payload = self._get_hidden_inputs(soup)
-            
-            payload.update({
-                '__EVENTTARGET': 'ctl00$ctl00$ContentPlaceHolder$RightContentPlaceHolder$chb_ExpColAll',
-                '__EVENTARGUMENT': '',
-                'ctl00$ctl00$ContentPlaceHolder$RightContentPlaceHolder$chb_ExpColAll': 'on'
-            })
-            
-            resp_expanded = self.session.post(self.URLS["PARTIAL"], data=payload, timeout=TIMEOUT)
-            soup_exp = BeautifulSoup(resp_expanded.text, 'html.parser')
-            
-            partials_map = {}
-            main_grid = soup_exp.find('table', id='ctl00_ctl00_ContentPlaceHolder_RightContentPlaceHolder_rg_Przedmioty_ctl00')
-            if not main_grid: return {}
-
-            rows = main_grid.find_all('tr')
-            current_key = None
-
-            for row in rows:
-                classes = row.get('class', [])
-                if ('rgRow' in classes or 'rgAltRow' in classes) and not row.find('table'):
-                    cells = row.find_all('td')
-                    if len(cells) > 2:
-                        subj = cells[1].get_text(strip=True)
-                        ctype = cells[2].get_text(strip=True)
-                        current_key = f"{subj}_{ctype}"
-                
-                nested_table = row.find('table')
-                if nested_table and current_key:
-                    grades_list = []
-                    for inner_row in nested_table.find_all('tr'):
-                        icells = inner_row.find_all('td')
-                        if len(icells) >= 4:
-                            g_val = icells[2].get_text(strip=True)
-                            if g_val:
-                                grades_list.append({
-                                    "grade": g_val,
-                                    "desc": icells[1].get_text(strip=True) if len(icells) > 1 else "",
-                                    "date": icells[3].get_text(strip=True) if len(icells) > 3 else "",
-                                    "teacher": icells[4].get_text(strip=True) if len(icells) > 4 else ""
-                                })
-                    partials_map[current_key] = grades_list
-            return partials_map
-        except Exception:
-            return {}
+            await asyncio.wait_for(self.crawl_semesters(), SEMESTER_DEADLINE)
+        except asyncio.TimeoutError:
+            error = f"deadline of {SEMESTER_DEADLINE}s exceeded"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if error:
+            print(f"Semester crawl error: {error}", file=sys.stderr)
+        self.metrics.record("semesters", {"total": time.perf_counter() - start}, ok=error is None, error=error)
+
+    async def get_partial_grades(self):
+        if not self.is_logged_in: return {}
+        url = self.URLS["PARTIAL"]
+        payload = self._cached_form(url)
+        if payload is not None:
+            try:
+                partials = await self._expand_all(payload)
+            except FetchError:
+                partials = None
+            # A rejected postback comes back collapsed (or as an error page).
+            if partials:
+                return partials
+            self._drop_form(url)
+        payload = await self._fetch_form(url, "partial_get", "partial_form", self._referer())
+        return await self._expand_all(payload)
+
+    async def _expand_all(self, payload):
+        url = self.URLS["PARTIAL"]
+        payload.update({
+            '__EVENTTARGET': 'ctl00$ctl00$ContentPlaceHolder$RightContentPlaceHolder$chb_ExpColAll',
+            '__EVENTARGUMENT': '',
+            'ctl00$ctl00$ContentPlaceHolder$RightContentPlaceHolder$chb_ExpColAll': 'on'
+        })
+
+        if self._streaming():
+            grid = await self._stream_grid("partial", parsers.PartialGridStream, "POST", url,
+                                           "partial_post", data=payload, headers=self._referer())
+            form, partials = grid.form, grid.result if grid.grid is not None else None
+        else:
+            resp_expanded = await self._request("POST", url, phase="partial_post", data=payload, headers=self._referer())
+            self._check_expired(resp_expanded)
+            form, partials = await self._parse("partial", parsers.parse_partial_page, resp_expanded.text)
+        if partials is None:
+            # Not an empty result: saving it would wipe every partial grade.
+            raise FetchError(f"POST {url}: no partial-grade grid in the response")
+        self._keep_form(url, form)
+        return partials
+
+    async def get_partial_index(self):
+        if not self.is_logged_in: return {}
+        url = self.URLS["PARTIAL"]
+        resp = await self._request("GET", url, phase="partial_get", headers=self._referer())
+        self._check_expired(resp)
+        form, index = await self._parse("partial_index", parsers.parse_partial_index, resp.text)
+        if index is None:
+            raise FetchError(f"GET {url}: no partial-grade grid in the response")
+        self.partial_index = index
+        self.form_state.pop(url, None)
+        self._keep_form(url, form)
+        return self.partial_index
+
+    async def get_partial_summary(self):
+        # Collapsed grid only; partial grades come from the per-subject cache
+        # and are None for subjects that were never loaded.
+        index = await self.get_partial_index()
+        await self._load_partial_cache()
+        return {key: self.partial_cache[key][0] if key in self.partial_cache else None for key in index}
+
+    async def get_subject_partials(self, key):
+        if not self.is_logged_in: return None
+        url = self.URLS["PARTIAL"]
+        payload = self._cached_form(url) if key in self.partial_index else None
+        if payload is not None:
+            try:
+                partials = await self._expand_subject(payload, key)
+            except FetchError:
+                partials = {}
+            if key in partials:
+                return partials[key]
+            self._drop_form(url)
+
+        await self.get_partial_index()
+        if key not in self.partial_index: return None
+        partials = await self._expand_subject(dict(self.form_state.get(url) or {}), key)
+        return partials.get(key, [])
+
+    async def _expand_subject(self, payload, key):
+        # The collapsed grid's state is kept for the next subject; the
+        # response has one row expanded.
+        button = self.partial_index[key]
+        payload[button[0]] = button[1]
+        url = self.URLS["PARTIAL"]
+        if self._streaming():
+            grid = await self._stream_grid("partial_subject", parsers.PartialGridStream, "POST", url,
+                                           "partial_subject", until=key, data=payload, headers=self._referer())
+            partials = grid.result if grid.grid is not None else None
+        else:
+            resp = await self._request("POST", url, phase="partial_subject", data=payload, headers=self._referer())
+            self._check_expired(resp)
+            partials = await self._parse("partial_subject", parsers.parse_partial_grades, resp.text)
+        if partials is None:
+            raise FetchError(f"POST {url}: no partial-grade grid in the response")
+        return partials
+
+    async def get_news(self, known=()):
+        # Only announcements newer than the high-water mark are parsed; the
+        # download stops at the first known one.
+        if not self.is_logged_in: return []
+        if self._streaming():
+            stream = lambda encoding: parsers.NewsStream(encoding, known)
+            grid = await self._stream_grid("news", stream, "GET", self.URLS["NEWS"], "news_get",
+                                           complete=False, headers=self._referer())
+            return grid.result
+        resp = await self._request("GET", self.URLS["NEWS"], phase="news_get", headers=self._referer())
+        self._check_expired(resp)
+        return await self._parse("news", functools.partial(parsers.parse_news, known=known), resp.text)
+
+    async def _fetch_news(self):
+        known = await asyncio.to_thread(cache.known_news) if self.persist else self.news_known
+        items = await self.get_news(known)
+        self.news_known.update(i["id"] for i in items)
+        if items and self.persist:
+            await asyncio.to_thread(cache.save_news, items)
+        return items
 
-    def refresh_data(self):
-        if not self.is_logged_in:
-            if not self.login():
-                return None
+    async def _refresh_news(self):
+        self.last_news = []
+        start = time.perf_counter()
+        error = None
         try:
-            finals = self.get_final_grades()
-            partials = self.get_partial_grades()
-            for key, p_grades in partials.items():
-                if key in finals:
-                    finals[key]['partial_grades'] = p_grades
-            self.save_cache(finals)
-            return finals
+            self.last_news = await asyncio.wait_for(self._fetch_news(), NEWS_DEADLINE)
+        except asyncio.TimeoutError:
+            error = f"deadline of {NEWS_DEADLINE}s exceeded"
         except Exception as e:
-            print(f"Refresh error: {e}")
+            error = f"{type(e).__name__}: {e}"
+        if error:
+            print(f"News error: {error}", file=sys.stderr)
+        self.metrics.record("news", {"total": time.perf_counter() - start}, ok=error is None, error=error)
+        return self.last_news
+
+    def _start_news(self):
+        # Like the semester crawl: started once the grades are saved, so a
+        # slow or failing News.aspx never delays or fails the grade refresh.
+        if self.news_task is None or self.news_task.done():
+            self.news_task = asyncio.ensure_future(self._refresh_news())
+        return self.news_task
+
+    async def _load_partial_cache(self):
+        if self.partial_cache is None:
+            self.partial_cache = await asyncio.to_thread(cache.load_partials) if self.persist else {}
+
+    def partials_stale(self, key, ttl=PARTIAL_TTL):
+        cached = (self.partial_cache or {}).get(key)
+        return cached is None or time.time() - cached[1] > ttl
+
+    def stale_partials(self, ttl=PARTIAL_TTL):
+        # Never loaded subjects first, then the oldest.
+        stale = [key for key in self.partial_index if self.partials_stale(key, ttl)]
+        cached = self.partial_cache or {}
+        return sorted(stale, key=lambda key: cached[key][1] if key in cached else -1)
+
+    async def load_subject_partials(self, key):
+        if not await self.ensure_login():
+            raise FetchError(self.last_error or "login failed")
+        await self._load_partial_cache()
+        try:
+            grades = await self.get_subject_partials(key)
+        except SessionExpired:
+            # The form state belongs to the old session; get a fresh one.
+            self.form_state.pop(self.URLS["PARTIAL"], None)
+            if not await self.login():
+                raise FetchError(self.last_error or "login failed")
+            grades = await self.get_subject_partials(key)
+        if grades is None:
             return None
+
+        now = time.time()
+        self.partial_cache[key] = (grades, now)
+        if key in self.data:
+            record = self.data[key].replace(partial_grades=grades)
+            self.data = {**self.data, key: record}
+            self.fingerprints[key] = fingerprint(record)
+        if self.persist:
+            await asyncio.to_thread(cache.save_partials, key, grades, now)
+        return grades
+
+    def _partials(self):
+        return self.get_partial_summary() if self.lazy_partials else self.get_partial_grades()
+
+    async def _fetch_all(self, concurrent):
+        if not concurrent:
+            return await self._timed("final", self.get_final_grades()), await self._timed("partial", self._partials())
+        tasks = [
+            asyncio.ensure_future(self._timed("final", self.get_final_grades())),
+            asyncio.ensure_future(self._timed("partial", self._partials())),
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # Half a result is useless; stop the other fetch as well.
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def refresh_data(self, concurrent=True):
+        self.last_error = None
+        self.timings = {}
+        self.sizes = {}
+        self.form_stats = dict.fromkeys(FORM_STATS, 0)
+        start = time.perf_counter()
+        try:
+            data = await asyncio.wait_for(self._refresh(concurrent), self.deadline)
+            self.timings["total"] = time.perf_counter() - start
+            self.metrics.record("refresh", self.timings, self.sizes, self.form_stats)
+            if data and self.fetch_news:
+                self._start_news()
+            if data and self.all_semesters:
+                self._start_crawl()
+            return data
+        except asyncio.TimeoutError:
+            self.last_error = f"deadline of {self.deadline}s exceeded"
+        except FetchError as e:
+            self.last_error = str(e)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+        self.timings["total"] = time.perf_counter() - start
+        self.metrics.record("refresh", self.timings, self.sizes, self.form_stats, ok=False, error=self.last_error)
+        print(f"Refresh error: {self.last_error}", file=sys.stderr)
+        return None
+
+    async def _refresh(self, concurrent):
+        # Either both grade pages arrive or refresh_data fails as a whole, so
+        # an incomplete result is never cached.
+        if not await self._timed("login", self.ensure_login(verify=False)):
+            raise FetchError(self.last_error or "login failed")
+        start = time.perf_counter()
+        try:
+            finals, partials = await self._fetch_all(concurrent)
+        except SessionExpired:
+            # Restored cookies can die server-side; log in again and retry once.
+            if not await self.login():
+                raise FetchError(self.last_error or "login failed")
+            finals, partials = await self._fetch_all(concurrent)
+        self.timings["fetch_wall"] = time.perf_counter() - start
+        self.timings["fetch_serial"] = self.timings["final"] + self.timings["partial"]
+        self.save_session()
+
+        for key, p_grades in partials.items():
+            if key in finals:
+                finals[key].partial_grades = p_grades
+        if not finals:
+            return finals
+        self.data = finals
+
+        new_prints = {k: fingerprint(v) for k, v in finals.items()}
+        self.last_changes = compute_changeset(self.fingerprints, new_prints)
+        self.fingerprints = new_prints
+        if self.persist:
+            await self._timed("save_cache", asyncio.to_thread(self.save_cache, finals, self.last_changes))
+        return finals
+
+class ZUT:
+    # Blocking facade over AsyncZUT for scripts and other non-async callers.
+    # It owns a private event loop so the pooled connections survive between
+    # calls; an instance must not be used from two threads at once.
+    URLS = AsyncZUT.URLS
+
+    def __init__(self, username, password, persist=True, base_url=None):
+        self._loop = asyncio.new_event_loop()
+        self._client = AsyncZUT(username, password, persist=persist, base_url=base_url)
+        self.URLS = self._client.URLS
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _run(self, coro):
+        return self._loop.run_until_complete(coro)
+
+    def login(self):
+        return self._run(self._client.login())
+
+    def restore_session(self):
+        return self._run(self._client.restore_session())
+
+    def check_session(self):
+        return self._run(self._client.check_session())
+
+    def ensure_login(self):
+        return self._run(self._client.ensure_login())
+
+    def get_final_grades(self):
+        return self._run(self._client.get_final_grades())
+
+    def get_partial_grades(self):
+        return self._run(self._client.get_partial_grades())
+
+    def load_subject_partials(self, key):
+        return self._run(self._client.load_subject_partials(key))
+
+    def refresh_data(self, concurrent=True):
+        return self._run(self._client.refresh_data(concurrent))
+
+    def close(self):
+        self._run(self._client.close())
+        self._loop.close()
@@ -1,25 +1,56 @@
 
-import json
-import os
+import asyncio
+import importlib
+import sys
 import time
+_START = time.perf_counter()
+
 from datetime import datetime
 from textual.app import App, ComposeResult
 from textual.containers import Container
-from textual.widgets import Header, Footer, DataTable, Label, Button, Input
+from textual.widgets import Header, Footer, DataTable, Label, Button, Input, Static
 from textual.screen import Screen
 from textual.binding import Binding
 
-from .zut_client import ZUT
+# Only the cache and config helpers are imported eagerly; the HTTP and
+# scraping stack (httpx, bs4) is imported on a thread by ZutApp.import_network.
+from .cache import current_semester, fetch_info, load_cache, load_news, load_semesters
+from .config import read_config, resolve_base_url, save_config
+from .daemon import connect as connect_daemon
+from .metrics import METRICS
+from .model import load_data
+from .render import RenderModel, fmt_grade, partial_rows
+from .search import GradeStats, SearchIndex
 
-USER_HOME = os.path.expanduser("~")
-APP_DIR = os.path.join(USER_HOME, "zutui")
-if not os.path.exists(APP_DIR):
-    os.makedirs(APP_DIR)
+IMPORT_SECONDS = time.perf_counter() - _START
 
-CONFIG_FILE = os.path.join(APP_DIR, "config.json")
 REFRESH_INTERVAL = 1800
+PREFETCH_BUDGET = 3
+# Cached grades younger than CACHE_TTL are shown without going online; up to
+# CACHE_MAX_STALE they are shown while a refresh runs in the background.
+CACHE_TTL = 600
+CACHE_MAX_STALE = 86400
+AGE_INTERVAL = 30
+HISTORY_SIZE = 50
+COLUMNS = [
+    ("Przedmiot", "subject"), ("Typ", "type"), ("Oceny Częściowe", "partials"),
+    ("Semestr 1", "term_1"), ("Poprawka 1", "retake_1"), ("Poprawka 2", "retake_2"), ("Komis", "commission"),
+]
+
+def format_age(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "Dane sprzed chwili"
+    if minutes < 60:
+        return f"Dane sprzed {minutes} min"
+    if minutes < 48 * 60:
+        return f"Dane sprzed {minutes // 60} godz."
+    return f"Dane sprzed {minutes // 1440} dni"
 
 class LoginScreen(Screen):
+    def on_mount(self) -> None:
+        self.call_after_refresh(self.app.mark_first_frame)
+
     def compose(self) -> ComposeResult:
         yield Container(
             Label("ZUT e-Dziekanat Login", id="login_title"),
@@ -44,46 +75,44 @@ class LoginScreen(Screen):
             self.query_one("#status_msg", Label).update("[!] Proszę wypełnić wszystkie pola.")
             return
 
-        self.app.zut_client = ZUT(user, password)
+        self.app.credentials = {"username": user, "password": password}
+        self.app.zut_client = None
         self.query_one("#status_msg", Label).update("Trwa logowanie...")
         self.query_one("#login_btn", Button).disabled = True
         self.query_one("#user", Input).disabled = True
         self.query_one("#pass", Input).disabled = True
         
-        self.run_worker(self.perform_login_action(user, password), thread=True)
-
-    def perform_login_action(self, user, password):
-        def job():
-            success = self.app.zut_client.login()
-            if success:
-                try:
-                    with open(CONFIG_FILE, "w") as f:
-                        json.dump({"username": user, "password": password}, f)
-                except: pass
-                
-                def do_switch():
-                    self.app.switch_screen(DashboardScreen())
-                self.app.call_from_thread(do_switch)
-            else:
-                def show_error():
-                    self.query_one("#status_msg", Label).update("[!] Błąd logowania.")
-                    self.query_one("#login_btn", Button).disabled = False
-                    self.query_one("#user", Input).disabled = False
-                    self.query_one("#pass", Input).disabled = False
-                    self.query_one("#pass", Input).focus()
-                self.app.call_from_thread(show_error)
-        return job
+        self.run_worker(self.perform_login_action(user, password), exclusive=True)
+
+    async def perform_login_action(self, user, password):
+        try:
+            client = await self.app.get_client()
+            success = await client.login()
+        except Exception:
+            success = False
+        if success:
+            save_config(user, password)
+            self.app.switch_screen(DashboardScreen(daemon=connect_daemon()))
+        else:
+            self.query_one("#status_msg", Label).update("[!] Błąd logowania.")
+            self.query_one("#login_btn", Button).disabled = False
+            self.query_one("#user", Input).disabled = False
+            self.query_one("#pass", Input).disabled = False
+            self.query_one("#pass", Input).focus()
 
 class DetailsScreen(Screen):
     BINDINGS = [("escape", "app.pop_screen", "Zamknij")]
 
-    def __init__(self, subject_data):
+    def __init__(self, subject_data, rows=None, key=None, on_loaded=None):
         super().__init__()
         self.subject_data = subject_data
+        self.rows = rows
+        self.key = key
+        self.on_loaded = on_loaded
 
     def compose(self) -> ComposeResult:
         yield Container(
-            Label(f"{self.subject_data['subject']} - Szczegóły", classes="details_title"),
+            Label(f"{self.subject_data.subject} - Szczegóły", classes="details_title"),
             DataTable(id="details_table"),
             Button("Zamknij (Esc)", variant="error", id="close_btn"),
             classes="modal_container"
@@ -95,22 +124,111 @@ class DetailsScreen(Screen):
         table.zebra_stripes = True
         table.add_columns("Opis", "Ocena", "Data", "Nauczyciel")
         
-        partials = self.subject_data.get("partial_grades", [])
-        
-        if not partials:
-            table.add_row("Brak ocen cząstkowych", "-", "-", "-")
-        else:
-            for p in partials:
-                val = p.get("grade", "-")
-                color = "red" if "2" in val else "green"
-                fmt_val = f"[{color}]{val}[/]"
-                
-                table.add_row(
-                    p.get("desc", "-"),
-                    fmt_val,
-                    p.get("date", "-"),
-                    p.get("teacher", "-")
-                )
+        with self.app.batch_update():
+            for row in self.rows or partial_rows(self.subject_data.partial_grades):
+                table.add_row(*row)
+        table.focus()
+
+        client = self.app.zut_client
+        if self.key and client is not None and client.lazy_partials and client.partials_stale(self.key):
+            table.loading = True
+            self.run_worker(self.load_partials_worker(client), exclusive=True)
+
+    async def load_partials_worker(self, client):
+        table = self.query_one(DataTable)
+        try:
+            grades = await client.load_subject_partials(self.key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            grades = None
+        table.loading = False
+        if grades is None:
+            return
+        with self.app.batch_update():
+            table.clear()
+            for row in partial_rows(grades):
+                table.add_row(*row)
+        if self.on_loaded:
+            self.on_loaded(self.key)
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        self.app.pop_screen()
+
+class NewsScreen(Screen):
+    BINDINGS = [("escape", "app.pop_screen", "Zamknij")]
+
+    def compose(self) -> ComposeResult:
+        yield Container(
+            Label("Ogłoszenia", classes="details_title"),
+            DataTable(id="news_table"),
+            Static("", id="news_body"),
+            Button("Zamknij (Esc)", variant="error", id="close_btn"),
+            classes="modal_container"
+        )
+
+    def on_mount(self):
+        self.items = {item["id"]: item for item in load_news()}
+        table = self.query_one(DataTable)
+        table.cursor_type = "row"
+        table.zebra_stripes = True
+        table.add_columns("Data", "Tytuł")
+
+        with self.app.batch_update():
+            for item in self.items.values():
+                table.add_row(item["date"] or "-", item["title"], key=item["id"])
+            if not self.items:
+                table.add_row("-", "Brak ogłoszeń")
+        table.focus()
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted):
+        item = self.items.get(event.row_key.value)
+        self.query_one("#news_body", Static).update(item["body"] if item else "")
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        self.app.pop_screen()
+
+class TranscriptScreen(Screen):
+    BINDINGS = [("escape", "app.pop_screen", "Zamknij")]
+
+    def __init__(self, current_data):
+        super().__init__()
+        self.current_data = current_data
+
+    def compose(self) -> ComposeResult:
+        yield Container(
+            Label("Wszystkie semestry", classes="details_title", id="transcript_title"),
+            DataTable(id="transcript_table"),
+            Button("Zamknij (Esc)", variant="error", id="close_btn"),
+            classes="modal_container"
+        )
+
+    def on_mount(self):
+        # Closed semesters come from the cache only; the current one is
+        # whatever the dashboard shows.
+        semesters = load_semesters()
+        closed = len(semesters)
+        if self.current_data:
+            sid, label = current_semester() or ("", "Bieżący semestr")
+            semesters.append((sid, label, self.current_data))
+        table = self.query_one(DataTable)
+        table.cursor_type = "row"
+        table.zebra_stripes = True
+        table.add_columns("Semestr", "Przedmiot", "Typ", "Ocena")
+
+        transcript = {}
+        with self.app.batch_update():
+            for sid, label, data in reversed(semesters):
+                for key, item in data.items():
+                    transcript[f"{sid}/{key}"] = item
+                    table.add_row(label, item.subject, item.type, fmt_grade(item.latest), key=f"{sid}/{key}")
+            if not closed:
+                table.add_row("-", 'Starsze semestry: dodaj "all_semesters": true do config.json', "-", "-")
+        stats = GradeStats()
+        stats.update(transcript)
+        if stats.average is not None:
+            self.query_one("#transcript_title", Label).update(
+                f"Wszystkie semestry ({len(semesters)}) - średnia: {stats.average:.2f}")
         table.focus()
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
@@ -123,111 +241,390 @@ class GradesTable(DataTable):
         Binding("k", "cursor_up", "W górę"),
     ]
 
+def format_debug_panel(metrics):
+    lines = []
+    for kind, title in (("startup", "Start aplikacji"), ("refresh", "Ostatnie odświeżenie"),
+                        ("login", "Ostatnie logowanie")):
+        entry = metrics.last(kind)
+        if not entry:
+            continue
+        stamp = datetime.fromtimestamp(entry["ts"]).strftime("%H:%M:%S")
+        result = "[green]ok[/]" if entry["ok"] else f"[red]{entry.get('error', 'błąd')}[/]"
+        lines.append(f"[bold]{title}[/] {stamp} {result}")
+        for name, seconds in entry["spans"].items():
+            size = entry["bytes"].get(name)
+            size = f"{size / 1024:8.1f} kB" if size is not None else ""
+            lines.append(f"  {name:<20}{seconds * 1000:9.1f} ms {size}")
+        counters = entry.get("counters")
+        if counters:
+            lines.append(f"  stan formularzy: {counters['hit']} trafień, {counters['miss']} chybień, "
+                         f"{counters['stale']} nieaktualnych")
+
+    ui = {}
+    for entry in metrics.recent("ui", limit=HISTORY_SIZE):
+        ui.update(entry["spans"])
+    if ui:
+        lines.append("[bold]Interfejs[/]")
+        lines += [f"  {name:<20}{seconds * 1000:9.1f} ms" for name, seconds in ui.items()]
+
+    totals = [e["spans"].get("total", 0) for e in metrics.recent("refresh")]
+    if totals:
+        lines.append("[bold]Historia[/] " + " ".join(f"{t:.1f}s" for t in totals))
+    return "\n".join(lines) or "Brak pomiarów."
+
 class DashboardScreen(Screen):
+    AUTO_FOCUS = "#grades_table"
     BINDINGS = [
-        ("f5", "refresh_grades", "Odśwież dane")
+        ("f5", "refresh_grades", "Odśwież dane"),
+        ("f12", "toggle_debug", "Panel diagnostyczny"),
+        ("slash", "search", "Szukaj"),
+        ("n", "news", "Ogłoszenia"),
+        ("t", "transcript", "Wszystkie semestry"),
+        Binding("escape", "close_search", "Zamknij wyszukiwanie", show=False),
     ]
 
+    def __init__(self, offline=False, daemon=None):
+        # offline: an empty table fed only through update_table (benchmarks).
+        # daemon: a connection to a running `zutui daemon` to follow.
+        super().__init__()
+        self.offline = offline
+        self.daemon = daemon
+
     def compose(self) -> ComposeResult:
         yield Container(
             Label("Twoje Oceny", classes="table_title"),
             Label("Ostatnia aktualizacja: Teraz", id="status_bar", classes="status_ok"),
+            Input(placeholder="Szukaj: przedmiot, typ, prowadzący", id="search_bar"),
+            Label("", id="stats_bar"),
             GradesTable(id="grades_table"),
             id="main_container"
         )
+        yield Static("", id="debug_panel")
         yield Container(
             Label("F5 - Odśwież dane"),
             Label("Enter - szczegóły ocen cząstkowych"),
+            Label("/ - szukaj"),
+            Label("N - ogłoszenia"),
+            Label("T - wszystkie semestry"),
+            Label("F12 - panel diagnostyczny"),
             id="info_container"
         )
 
     def on_mount(self) -> None:
         self.current_data = {}
+        self.render_model = RenderModel()
+        self.rendered = {}
+        self.search = SearchIndex()
+        self.stats = GradeStats()
+        self.query_text = ""
+        self.poll_timer = None
+        self.status_msg = ""
+        self.fetched_at = None
         table = self.query_one(GradesTable)
         table.cursor_type = "row"
         table.zebra_stripes = True
-        table.add_columns("Przedmiot", "Typ", "Oceny Częściowe", "Semestr 1", "Poprawka 1", "Poprawka 2", "Komis")
-        
-        cached_data = self.app.zut_client.load_cache()
+        for label, col_key in COLUMNS:
+            table.add_column(label, key=col_key)
+        if self.offline:
+            return
+
+        with METRICS.span("load_cache"):
+            cached_data = load_cache()
+            fetched = fetch_info() if cached_data else None
+        self.call_after_refresh(self.app.mark_first_frame)
+        if self.app.startup_profile:
+            self.update_table(cached_data)
+            return
+
         if cached_data:
             self.update_table(cached_data)
-            self.query_one("#status_bar", Label).update("[+] Załadowano z pamięci. Odświeżanie...")
+            self.fetched_at = fetched and fetched.get("at")
+        self.set_interval(AGE_INTERVAL, self.show_status)
+
+        self.cache_ttl = self.app.settings.get("cache_ttl", CACHE_TTL)
+        max_stale = self.app.settings.get("cache_max_stale", CACHE_MAX_STALE)
+
+        # A running `zutui daemon` already polls e-Dziekanat; subscribe to it
+        # instead of logging in a second time.
+        if self.daemon:
+            self.set_status("[+] Połączono z demonem zutui.")
+            self.run_worker(self.daemon_worker, thread=True)
+            return
+
+        if cached_data and self.app.is_fresh(fetched):
+            # Fetched moments ago (by another zutui, the daemon, ...).
+            self.set_status("[+] Załadowano z pamięci.")
+            self.set_timer(self.fetched_at + self.cache_ttl - time.time(), self.revalidate)
+            return
+        if cached_data and self.fetched_at and time.time() - self.fetched_at < max_stale:
+            self.set_status("[+] Załadowano z pamięci. Odświeżanie...")
+        elif cached_data:
+            self.set_status("[?] Dane w pamięci są nieaktualne. Pobieranie danych...")
+            table.loading = True
         else:
-            self.query_one("#status_bar", Label).update("[?] Pobieranie danych...")
+            self.set_status("[?] Pobieranie danych...")
             table.loading = True
+        self.start_polling()
+
+    def revalidate(self):
+        fetched = fetch_info()
+        if not self.app.is_fresh(fetched):
+            self.start_polling()
+            return
+        if fetched["at"] > (self.fetched_at or 0):
+            self.update_table(load_cache())
+            self.set_status("[+] Załadowano z pamięci.", fetched["at"])
+        self.set_timer(fetched["at"] + self.cache_ttl - time.time(), self.revalidate)
+
+    def set_status(self, msg, fetched_at=None):
+        self.status_msg = msg
+        if fetched_at:
+            self.fetched_at = fetched_at
+        self.show_status()
+
+    def show_status(self):
+        text = self.status_msg
+        if self.fetched_at:
+            text += f"  |  {format_age(time.time() - self.fetched_at)}"
+        self.query_one("#status_bar", Label).update(text)
+
+    def action_search(self):
+        search_bar = self.query_one("#search_bar", Input)
+        search_bar.display = True
+        search_bar.focus()
+
+    def action_close_search(self):
+        search_bar = self.query_one("#search_bar", Input)
+        if not search_bar.display:
+            return
+        search_bar.value = ""
+        search_bar.display = False
+        self.query_one(GradesTable).focus()
+
+    def on_input_changed(self, event: Input.Changed):
+        if event.input.id == "search_bar" and event.value != self.query_text:
+            self.query_text = event.value
+            self.filter_rows()
+
+    def on_input_submitted(self, event: Input.Submitted):
+        if event.input.id == "search_bar":
+            self.query_one(GradesTable).focus()
 
-        self.run_worker(self.refresh_data_worker, exclusive=True, thread=True)
-        self.set_interval(REFRESH_INTERVAL, self.scheduled_refresh)
+    def filter_rows(self):
+        # Rows are only removed or re-added where the match set changed.
+        table = self.query_one(GradesTable)
+        matches = self.search.search(self.query_text)
+        visible = set(matches)
+        with self.app.batch_update():
+            for row_key in list(table.rows):
+                if row_key.value not in visible:
+                    table.remove_row(row_key)
+            missing = [key for key in matches if key not in table.rows and key in self.rendered]
+            for key in missing:
+                table.add_row(*self.rendered[key].cells, key=key)
+            if missing:
+                order = {self.rendered[key].cells[:2]: i for i, key in enumerate(self.rendered)}
+                table.sort("subject", "type", key=lambda cells: order.get(cells, 0))
+        self.update_stats()
+
+    def update_stats(self):
+        average = self.stats.average
+        text = (f"Średnia ocen końcowych: {average:.2f}" if average is not None else "Średnia ocen końcowych: -")
+        text += f"  |  Oceny niedostateczne: {self.stats.failing}"
+        if self.query_text:
+            text += f"  |  Wyniki: {self.query_one(GradesTable).row_count}/{len(self.current_data)}"
+        self.query_one("#stats_bar", Label).update(text)
+
+    def action_news(self):
+        self.app.push_screen(NewsScreen())
+
+    def action_transcript(self):
+        self.app.push_screen(TranscriptScreen(self.current_data))
+
+    async def news_worker(self, task):
+        # Shielded: a later refresh's worker replaces this one, not the fetch.
+        self.announce_news(await asyncio.shield(task))
+
+    def announce_news(self, items):
+        if items:
+            titles = "\n".join(item["title"] for item in items[:3])
+            self.notify(titles, title=f"Nowe ogłoszenia: {len(items)}")
+
+    def action_toggle_debug(self):
+        panel = self.query_one("#debug_panel", Static)
+        panel.display = not panel.display
+        self.update_debug_panel()
+
+    def update_debug_panel(self):
+        panel = self.query_one("#debug_panel", Static)
+        if panel.display:
+            panel.update(format_debug_panel(METRICS))
+
+    def on_unmount(self) -> None:
+        if self.daemon:
+            daemon, self.daemon = self.daemon, None
+            daemon.close()
+
+    def start_polling(self):
+        self.run_worker(self.refresh_data_worker(), exclusive=True)
+        if self.poll_timer is None:
+            self.poll_timer = self.set_interval(REFRESH_INTERVAL, self.scheduled_refresh)
 
     def action_refresh_grades(self):
-        self.query_one("#status_bar", Label).update("[!] Wymuszanie odświeżania...")
+        self.set_status("[!] Wymuszanie odświeżania...")
+        if self.daemon and self.daemon.request_refresh():
+            return
         self.query_one(GradesTable).loading = True
-        self.run_worker(self.refresh_data_worker, exclusive=True, thread=True)
+        self.run_worker(self.refresh_data_worker(), exclusive=True)
+
+    def daemon_worker(self):
+        daemon = self.daemon
+        for event in daemon.events():
+            stamp = datetime.fromtimestamp(event["updated_at"]).strftime("%H:%M:%S") if event.get("updated_at") else "-"
+            if event["type"] == "snapshot" and event["data"]:
+                data = load_data(event["data"])
+                rendered = self.render_model.build(data)
+                self.app.call_from_thread(self.update_table, data, None, rendered)
+                self.app.call_from_thread(self.set_status, f"[+] Demon: dane z {stamp}", event.get("updated_at"))
+            elif event["type"] == "changes":
+                data = load_data(event["data"])
+                rendered = self.render_model.build(data)
+                self.app.call_from_thread(self.update_table, data, event["changes"], rendered)
+                self.app.call_from_thread(self.set_status, f"[+] Demon: zaktualizowano {stamp}",
+                                          event.get("updated_at"))
+            elif event["type"] == "news":
+                self.app.call_from_thread(self.announce_news, event["items"])
+            elif event["type"] == "status":
+                msg = f"[+] Demon: bez zmian {stamp}" if event.get("ok") else "[!] Demon: błąd sieci"
+                self.app.call_from_thread(self.set_status, msg, event.get("ok") and event.get("updated_at"))
+
+        if self.daemon is not daemon:
+            # Closed by on_unmount, the app is quitting.
+            return
+        # The daemon went away, fall back to polling on our own.
+        self.daemon.close()
+        self.daemon = None
+        self.app.call_from_thread(self.set_status, "[!] Demon rozłączony. Odświeżanie...")
+        self.app.call_from_thread(self.start_polling)
 
     def on_data_table_row_selected(self, event: DataTable.RowSelected):
         row_key = event.row_key.value
         if row_key and row_key in self.current_data:
-            self.app.push_screen(DetailsScreen(self.current_data[row_key]))
+            rendered = self.rendered.get(row_key)
+            self.app.push_screen(DetailsScreen(self.current_data[row_key], rendered.details if rendered else None,
+                                               key=row_key, on_loaded=self.apply_partials))
+
+    async def prefetch_worker(self):
+        # Lazy mode: load a few stale subjects per refresh in the background,
+        # each one is a postback with the whole view state; the rest load
+        # when their row is opened.
+        client = await self.app.get_client()
+        for key in client.stale_partials()[:PREFETCH_BUDGET]:
+            try:
+                grades = await client.load_subject_partials(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                break
+            if grades is not None:
+                self.apply_partials(key)
+
+    def apply_partials(self, key):
+        client = self.app.zut_client
+        if client is not None and key in client.data and key in self.current_data:
+            rendered = self.render_model.build(client.data, client.fingerprints)
+            self.update_table(client.data, {"added": [], "removed": [], "modified": [key]}, rendered)
 
     def scheduled_refresh(self):
-        self.query_one("#status_bar", Label).update("[?] Sprawdzanie aktualizacji...")
-        self.run_worker(self.refresh_data_worker, exclusive=True, thread=True)
+        fetched = fetch_info()
+        if self.app.is_fresh(fetched):
+            # Someone else refreshed the cache meanwhile.
+            if fetched["at"] > (self.fetched_at or 0):
+                self.update_table(load_cache())
+                self.set_status("[+] Załadowano z pamięci.", fetched["at"])
+            return
+        self.set_status("[?] Sprawdzanie aktualizacji...")
+        self.run_worker(self.refresh_data_worker(), exclusive=True)
 
-    def refresh_data_worker(self): 
+    async def refresh_data_worker(self):
+        # Runs on the app's event loop; a new refresh (F5) cancels this one.
         try:
-            if not self.app.zut_client.is_logged_in:
-                if not self.app.zut_client.login():
-                    self.app.call_from_thread(self.query_one("#status_bar", Label).update, "[!] Błąd ponownego logowania")
-                    return
-
-            new_data = self.app.zut_client.refresh_data()
+            client = await self.app.get_client()
+            warm_up, self.app.warm_up_task = self.app.warm_up_task, None
+            if warm_up is not None:
+                # The first refresh was started at launch.
+                new_data = await warm_up
+            else:
+                if not client.fingerprints:
+                    client.track(self.current_data)
+                if not client.is_logged_in:
+                    if not await client.ensure_login(verify=False):
+                        self.set_status("[!] Błąd ponownego logowania")
+                        self.stop_loading()
+                        return
+                new_data = await client.refresh_data()
             now = datetime.now().strftime("%H:%M:%S")
             
             if new_data:
-                self.app.call_from_thread(self.update_table, new_data)
-                self.app.call_from_thread(self.query_one("#status_bar", Label).update, f"[+] Zaktualizowano: {now}")
+                took = client.timings.get("fetch_wall", 0)
+                with METRICS.span("render_rows"):
+                    rendered = await asyncio.to_thread(self.render_model.build, new_data, client.fingerprints)
+                self.update_table(new_data, client.last_changes, rendered)
+                self.set_status(f"[+] Zaktualizowano: {now} ({took:.1f}s)", time.time())
+                if client.news_task:
+                    self.run_worker(self.news_worker(client.news_task), group="news", exclusive=True)
+                if client.lazy_partials:
+                    self.run_worker(self.prefetch_worker(), group="prefetch", exclusive=True)
+            elif client.last_error:
+                self.set_status(f"[!] Błąd sieci: {now} ({client.last_error})")
             else:
-                self.app.call_from_thread(self.query_one("#status_bar", Label).update, f"[!] Błąd sieci: {now}")
-        
+                self.set_status(f"[!] Błąd sieci: {now}")
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            self.app.call_from_thread(self.query_one("#status_bar", Label).update, f"[!] Błąd: {str(e)}")
-        
-        finally:
-            def stop_loading():
-                try: self.query_one(GradesTable).loading = False
-                except: pass
-            self.app.call_from_thread(stop_loading)
-
-    def update_table(self, data):
-        self.current_data = data
+            self.set_status(f"[!] Błąd: {str(e)}")
+        self.stop_loading()
+        self.update_debug_panel()
+
+    def stop_loading(self):
+        try: self.query_one(GradesTable).loading = False
+        except: pass
+
+    def update_table(self, data, changes=None, rendered=None):
+        if rendered is None:
+            rendered = self.render_model.build(data)
         table = self.query_one(GradesTable)
-        table.clear()
-        
-        for key, item in data.items():
-            finals = item['final_grades']
-            
-            def fmt_grade(g_obj):
-                if not g_obj: return "-"
-                val = g_obj['grade'].replace(',', '.')
-                color = "red" if "2" in val else "green"
-                return f"[{color}]{val}[/]"
-
-            partials_list = item.get('partial_grades', [])
-            if partials_list:
-                p_str_list = []
-                for p in partials_list:
-                    raw_val = p['grade'].strip().replace(',', '.')
-                    p_str_list.append(f"[cyan]{raw_val}[/]")
-                p_str = ", ".join(p_str_list)
+        full = changes is None or not table.row_count
+        # The search index and the aggregates follow the same changeset.
+        self.search.update(data, None if full else changes)
+        self.stats.update(data, None if full else changes)
+        with METRICS.span("update_table"), self.app.batch_update():
+            if full:
+                table.clear()
+                visible = set(self.search.search(self.query_text))
+                for key, row in rendered.items():
+                    if key in visible:
+                        table.add_row(*row.cells, key=key)
             else:
-                p_str = "[dim]-[/dim]"
-
-            table.add_row(
-                f"[bold]{item['subject']}[/]", item['type'], p_str,
-                fmt_grade(finals.get('term_1')), fmt_grade(finals.get('retake_1')),
-                fmt_grade(finals.get('retake_2')), fmt_grade(finals.get('commission')),
-                key=key
-            )
+                # Patch only what the client reported as changed, so the cursor
+                # and scroll position survive a routine poll.
+                for key in changes["removed"]:
+                    if key in table.rows:
+                        table.remove_row(key)
+                for key in changes["modified"]:
+                    if key not in table.rows:
+                        continue
+                    old_cells = self.rendered[key].cells if key in self.rendered else ()
+                    for i, cell in enumerate(rendered[key].cells):
+                        if i >= len(old_cells) or old_cells[i] != cell:
+                            table.update_cell(key, COLUMNS[i][1], cell)
+            self.current_data = data
+            self.rendered = rendered
+            if not full:
+                # Added rows (and rows whose match changed) go through the filter.
+                self.filter_rows()
+        self.update_stats()
 
 class ZutApp(App):
     TITLE = "ZUT e-Dziekanat"
@@ -369,7 +766,7 @@ class ZutApp(App):
         padding: 1;
     }
 
-    #details_table {
+    #details_table, #news_table, #transcript_table {
         height: 1fr;
         width: 100%;
         margin-bottom: 1;
@@ -398,28 +795,152 @@ class ZutApp(App):
         }
     }
 
+    #news_body {
+        width: 100%;
+        height: auto;
+        max-height: 40%;
+        color: rgb(200, 200, 200);
+        margin-bottom: 1;
+        padding: 0 1;
+    }
+
     #close_btn {
         width: 100%;
     }
+
+    #search_bar {
+        display: none;
+        width: 100%;
+        height: auto;
+        background: rgb(20, 20, 20);
+        border: wide rgb(40, 40, 40);
+        color: rgb(225, 225, 225);
+    }
+
+    #stats_bar {
+        width: 100%;
+        height: auto;
+        background: rgb(19,19,19);
+        color: #a0a0a0;
+        padding: 0 1;
+        border-left: wide #282828;
+        border-right: wide #282828;
+        border-bottom: wide #282828;
+    }
+
+    #debug_panel {
+        display: none;
+        width: 100%;
+        height: auto;
+        max-height: 50%;
+        background: rgb(15, 15, 15);
+        color: rgb(150, 150, 150);
+        border: wide rgb(40, 40, 40);
+        padding: 0 1;
+    }
     """
 
-    def on_mount(self) -> None:
+    def __init__(self, startup_profile=False):
+        super().__init__()
+        self.startup_profile = startup_profile
+        self.startup_timings = {"import_ui": IMPORT_SECONDS}
+        self.settings = {}
+        self.credentials = None
         self.zut_client = None
-        
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, "r") as f:
-                    creds = json.load(f)
-                    self.zut_client = ZUT(creds["username"], creds["password"])
-                    self.push_screen(DashboardScreen())
-            except:
-                self.push_screen(LoginScreen())
-        else:
+        self.network = None
+        self.warm_up_task = None
+
+    def on_mount(self) -> None:
+        # config.json is read once; the client and the dashboard use these.
+        self.settings = read_config()
+        self.credentials = self.settings if self.settings.get("username") and self.settings.get("password") else None
+        if not self.credentials:
             self.push_screen(LoginScreen())
+            return
+        daemon = None
+        if not self.startup_profile:
+            # Decide now whether this launch goes online, so the login and the
+            # first refresh run while the dashboard composes and renders the cache.
+            daemon = connect_daemon()
+            if daemon is None and not self.is_fresh(fetch_info()):
+                self.import_network()
+                self.warm_up_task = asyncio.ensure_future(self.warm_up())
+        self.push_screen(DashboardScreen(daemon=daemon))
+
+    def is_fresh(self, fetched):
+        # Only data fetched from the configured e-Dziekanat counts.
+        if not fetched or fetched.get("base_url") != resolve_base_url(self.settings.get("base_url")):
+            return False
+        return time.time() - fetched.get("at", 0) < self.settings.get("cache_ttl", CACHE_TTL)
+
+    def import_network(self):
+        # Import the HTTP stack on a thread so the UI keeps drawing; it starts
+        # at once, not when the caller next yields.
+        if self.network is None:
+            loop = asyncio.get_running_loop()
+            self.network = loop.run_in_executor(None, importlib.import_module, ".zut_client", __package__)
+        return self.network
+
+    async def get_client(self):
+        if self.zut_client is None:
+            module = await self.import_network()
+            if self.zut_client is None:
+                self.zut_client = module.AsyncZUT(self.credentials["username"], self.credentials["password"],
+                                                  lazy_partials=bool(self.settings.get("lazy_partials")),
+                                                  fetch_news=True, base_url=self.settings.get("base_url"),
+                                                  all_semesters=bool(self.settings.get("all_semesters")))
+        return self.zut_client
+
+    async def warm_up(self):
+        # Network stack import, login and the first refresh, started at launch;
+        # the dashboard's first refresh picks up the result.
+        start = time.perf_counter()
+        client = await self.get_client()
+        imported = time.perf_counter() - start
+        # Changes are reported against the cached grades, as on any refresh.
+        await asyncio.to_thread(client.load_cache)
+        data = await client.refresh_data()
+        spans = {k: self.startup_timings[k] for k in ("first_frame",) if k in self.startup_timings}
+        spans["import_network"] = imported
+        spans.update({k: client.timings[k] for k in ("login", "fetch_wall", "total") if k in client.timings})
+        spans["fresh_data"] = time.perf_counter() - _START
+        self.startup_timings.update(spans)
+        METRICS.record("startup", spans, ok=data is not None, error=client.last_error)
+        return data
+
+    async def on_unmount(self) -> None:
+        if self.warm_up_task is not None:
+            self.warm_up_task.cancel()
+        if self.zut_client is not None:
+            await self.zut_client.close()
+
+    def mark_first_frame(self):
+        if "first_frame" in self.startup_timings:
+            return
+        self.startup_timings["first_frame"] = time.perf_counter() - _START
+        if self.startup_profile:
+            start = time.perf_counter()
+            from . import zut_client
+            self.startup_timings["import_network"] = time.perf_counter() - start
+            self.exit()
+
+def format_startup_profile(timings):
+    lines = ["zutui startup profile (since zutui import)"]
+    labels = [
+        ("import_ui", "UI imports (textual)"),
+        ("first_frame", "time to first frame"),
+        ("import_network", "network stack import (deferred)"),
+    ]
+    for key, label in labels:
+        if key in timings:
+            lines.append(f"  {label:<34}{timings[key] * 1000:8.1f} ms")
+    return "\n".join(lines)
 
-def main():
-    app = ZutApp()
+def main(startup_profile=False):
+    app = ZutApp(startup_profile=startup_profile)
     app.run()
+    if startup_profile:
+        print(format_startup_profile(app.startup_timings), file=sys.stderr)
 
 if __name__ == "__main__":
     main()